@@ -5,7 +5,9 @@
 # @Github  : https://github.com/sunfanyi
 # @Software: PyCharm
 
-import pygame.font
+import pygame
+
+import text_cache
 from game_function import resource_path
 
 
@@ -22,26 +24,27 @@ class TextButton:
             if 'bg_color' in settings else (100, 100, 100)
         self.text_color = settings['text_color'] \
             if 'text_color' in settings else (255, 255, 255)
-        font_size = settings['font_size'] \
+        self.font_size = settings['font_size'] \
             if 'font_size' in settings else 30
 
-        self.font = pygame.font.SysFont(None, font_size)
-
         self.prep_button(settings['msg'])
 
     def prep_button(self, msg):
         self.rect = pygame.Rect(0, 0, self.width, self.height)
         self.rect.center = self.center
 
-        self.msg_image = self.font.render(msg, True, self.text_color,
-                                          self.bg_color)
+        self.msg_image = text_cache.render(msg, self.font_size, self.text_color,
+                                           self.bg_color, sysfont=True)
 
         self.msg_image_rect = self.msg_image.get_rect()
         self.msg_image_rect.center = self.center
 
-    def draw_button(self):
-        self.screen.fill(self.bg_color, self.rect)
-        self.screen.blit(self.msg_image, self.msg_image_rect)
+        # the whole button as one image, the text may be larger than the button
+        self.image_rect = self.rect.union(self.msg_image_rect)
+        self.image = pygame.Surface(self.image_rect.size, pygame.SRCALPHA)
+        self.image.fill(self.bg_color, self.rect.move(-self.image_rect.x, -self.image_rect.y))
+        self.image.blit(self.msg_image, self.msg_image_rect.move(-self.image_rect.x,
+                                                                 -self.image_rect.y))
 
 
 class ImgButton:
@@ -74,8 +77,10 @@ class ImgButton:
         self.rect = pygame.Rect(0, 0, self.width, self.height)
         self.rect.center = self.center
 
-    def draw_button(self):
-        self.screen.blit(self.img, self.rect)
-        self.screen.blit(self.bg, self.rect)
+        # the whole button as one image, with the overlay blended
+        self.image_rect = self.rect
+        self.image = pygame.Surface(self.image_rect.size, pygame.SRCALPHA)
+        self.image.blit(self.img, (0, 0))
+        self.image.blit(self.bg, (0, 0))
 
 
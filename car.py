@@ -9,11 +9,12 @@ import numpy as np
 import pygame
 
 import game_function as gf
-from inverse_kinematics import calc_inverse
+from simulation import Vehicle
 
 
-class Car:
+class Car(Vehicle):
     """
+    Drawing of a Vehicle on the screen.
     Be careful with the coordinate system that Y-axis is flipped for visualisation,
     so as the car, so the left wheels are actually on the right side from the screen.
     When pressing the left key, the car actually turns right, but flipped on the screen.
@@ -23,148 +24,110 @@ class Car:
         self.screen = screen
         self.game_stats = game_stats
         self.workspace = workspace
-        self.scale = scale
 
         self.R_view = self.workspace.R_view
         self.offset = self.workspace.map_pos + self.settings.map_screen['topleft']
 
-        self.reset_dimensions()
-        self.reset_motion()
-        self.reset_positions()
+        super().__init__(settings.car, settings.map_screen, workspace.track, scale)
 
     def reset_dimensions(self):
-        self.length = 3.3 * self.scale
-        self.width = 2. * self.scale
-        self.height = 1.5 * self.scale
-        self.wheel_radius = 0.57 * self.scale
-        self.wheel_width = 0.48 * self.scale
-        self.wheel_offset = 0.2 * self.scale
-        self.wheel_base = 1.9 * self.scale
-
+        super().reset_dimensions()
         self.get_car_lines()
 
-    def reset_motion(self):
-        # Car control
-        self.moving_fwd = False
-        self.moving_bwd = False
-        self.turning_left = False
-        self.turning_right = False
-        self.brake = False
-
-        # Kinematics properties (update in inverse kinematics)
-        self.steering_angle = 0   # psi, in radians
-        # non-zero initial V, otherwise ICR = nan at the beginning
-        # beta will be zero even with steering when game starts until assign a speed
-        self.car_speed = 1e-10  # in m/s, avoid divided by zero
-        self.P_i_dot = np.float32([0, 0, 0, 0])  # X dot, Y dot, theta dot, psi dot
-        self.wheels_orientation = np.float32([0, 0, 0, 0])  # in radians, 4 wheels
-        self.wheels_speed = np.float32([0, 0, 0, 0])  # in rad/s, 4 wheels
-        self.ICR = np.nan  # instantaneous center of rotation
-
     def reset_positions(self, location='IC_logo'):
         # indicator of how many cycles the wheels have turned
         self.wheel_phi_counter = 0
 
-        # Transform matrices
-        self.T_body = np.eye(4)
-        self.T_wheels = [np.eye(4)] * 4  # FL, FR, RL, RR
-
-        # State properties
-        if location == 'IC_logo':
-            self.car_origin3d = np.float32([2900, 2310, self.wheel_radius])
-            self.car_orientation = -1.575  # theta, in radians
-        elif location == 'start':
-            self.car_origin3d = np.float32([self.workspace.blue_start[0],
-                                            self.workspace.blue_start[1],
-                                            self.wheel_radius])
-            self.car_orientation = -1.7  # theta, in radians
-        elif location == 'end':
-            self.car_origin3d = np.float32([self.workspace.blue_end[0],
-                                            self.workspace.blue_end[1],
-                                            self.wheel_radius])
-            self.car_orientation = -3.264  # theta, in radians
-        elif location == 'origin':
-            self.car_origin3d = np.float32([0, 0, self.wheel_radius])
-            self.car_orientation = 0  # theta, in radians
-        else:
-            raise ValueError('Invalid location')
-
+        super().reset_positions(location)
         self.car_origin2d = gf.point_3d_to_2d(*self.car_origin3d, R=self.R_view,
                                               offset=self.offset)
-        self.last_car_origin3d = self.car_origin3d.copy()
-        self.last_car_origin2d = self.car_origin2d
-        self.last_orientation = self.car_orientation
-        # self.car_orientation = 0  # theta, in radians
-        self.steering_rate = 0  # in rad/s
-
+        self.hold_pose()
         self.apply_transformations()
 
     def get_car_lines(self):
         """
-        For the body lines:
-        Get a list of 12 lines segments representing the car body, in car frame.
-
-        For the wheel curves:
-        get a list of 4 representing each wheel
-        each list contains two arrays of line segments
+        Pack the car model into one vertex buffer plus index buffers.
+
+        Vertices are homogeneous [5, 40, 4], one block per rigid part:
+            block 0: 8 body corners in car frame (the rest is padding)
+            block 1-4: FL, FR, RL, RR wheels in wheel frame,
+                       two curves of 20 points each
+        so that a single batched transform with one matrix per block
+        gives all the points in the global frame.
+
+        Index buffers (into the flattened [200, 3] vertices):
+            body_segments: [12, 2] line segments of the car body
+            wheel_curve_strips: [8, 20] polylines of the wheel curves
+            wheel_line_phases: [5, 16, 2] wheel lines for each spinning phase
         """
-        # corner points of the cuboid
-
-        top_front_left = np.array([self.length / 2, self.width / 2, self.height])
-        top_front_right = np.array([self.length / 2, -self.width / 2, self.height])
-        top_rear_left = np.array([-self.length / 2, self.width / 2, self.height])
-        top_rear_right = np.array([-self.length / 2, -self.width / 2, self.height])
-        bot_front_left = np.array([self.length / 2, self.width / 2, 0])
-        bot_front_right = np.array([self.length / 2, -self.width / 2, 0])
-        bot_rear_left = np.array([-self.length / 2, self.width / 2, 0])
-        bot_rear_right = np.array([-self.length / 2, -self.width / 2, 0])
-
-        # line segments for the car body
-        self.body_lines_local = [
-            np.array([top_front_left, top_front_right]),
-            np.array([top_front_right, top_rear_right]),
-            np.array([top_rear_right, top_rear_left]),
-            np.array([top_rear_left, top_front_left]),
-            np.array([bot_front_left,  bot_front_right]),
-            np.array([bot_front_right,  bot_rear_right]),
-            np.array([bot_rear_right, bot_rear_left]),
-            np.array([bot_rear_left, bot_front_left]),
-            np.array([top_front_left, bot_front_left]),
-            np.array([top_front_right, bot_front_right]),
-            np.array([top_rear_right, bot_rear_right]),
-            np.array([top_rear_left, bot_rear_left])
-        ]
-
-        # line segments for the wheels
-        x_shift = np.array([(self.length - self.wheel_base) / 2, 0, 0])
-        y_shift = np.array([0, self.wheel_width / 2, 0])
-        z_shift = np.array([0, 0, -self.wheel_offset])
-
-        self.wheel_centers_local = np.array([bot_front_left - x_shift + z_shift,
-                                             bot_front_right - x_shift + z_shift,
-                                             bot_rear_left + x_shift + z_shift,
-                                             bot_rear_right + x_shift + z_shift])
-
-        def _get_each_wheel(center, y_shift, num_points=20):
-            r = self.wheel_radius
-
-            center1 = center + y_shift
-            center2 = center - y_shift
-            # points on circles
-            t = np.linspace(0, 2 * np.pi, num_points)
-            x1 = center1[0] + r * np.cos(t)
-            y1 = center1[1] * np.ones_like(t)
-            z1 = center1[2] + r * np.sin(t)
-            x2 = center2[0] + r * np.cos(t)
-            y2 = center2[1] * np.ones_like(t)
-            z2 = center2[2] + r * np.sin(t)
-            self.wheel_curves_local.append([np.array([x1, y1, z1]), np.array([x2, y2, z2])])
-
-        self.wheel_curves_local = []
-        _get_each_wheel(self.wheel_centers_local[0], y_shift)
-        _get_each_wheel(self.wheel_centers_local[1], y_shift)
-        _get_each_wheel(self.wheel_centers_local[2], y_shift)
-        _get_each_wheel(self.wheel_centers_local[3], y_shift)
+        num_points = 20  # points on each wheel curve
+        block = 2 * num_points
+
+        # corner points of the cuboid, top face then bottom face,
+        # both in the order of front left, front right, rear right, rear left
+        x = np.array([1, 1, -1, -1]) * self.length / 2
+        y = np.array([1, -1, -1, 1]) * self.width / 2
+        corners = np.zeros((8, 3))
+        corners[:, 0] = np.tile(x, 2)
+        corners[:, 1] = np.tile(y, 2)
+        corners[:4, 2] = self.height
+
+        # line segments for the car body: top, bottom, vertical edges
+        loop = np.array([[0, 1], [1, 2], [2, 3], [3, 0]])
+        self.body_segments = np.vstack([loop, loop + 4,
+                                        np.column_stack([np.arange(4), np.arange(4) + 4])])
+
+        # wheel centers, FL, FR, RL, RR
+        x_shift = (self.length - self.wheel_base) / 2
+        bot_front_left, bot_front_right, bot_rear_right, bot_rear_left = corners[4:]
+        self.wheel_centers_local = np.array([bot_front_left, bot_front_right,
+                                             bot_rear_left, bot_rear_right])
+        self.wheel_centers_local[:, 0] -= np.sign(self.wheel_centers_local[:, 0]) * x_shift
+        self.wheel_centers_local[:, 2] -= self.wheel_offset
+
+        # points on the two circles of a wheel, in wheel frame
+        t = np.linspace(0, 2 * np.pi, num_points)
+        wheel = np.zeros((block, 3))
+        wheel[:, 0] = np.tile(self.wheel_radius * np.cos(t), 2)
+        wheel[:, 1] = np.repeat([self.wheel_width / 2, -self.wheel_width / 2], num_points)
+        wheel[:, 2] = np.tile(self.wheel_radius * np.sin(t), 2)
+
+        self.vertices_local = np.zeros((5, block, 4))
+        self.vertices_local[..., 3] = 1
+        self.vertices_local[0, :8, :3] = corners
+        self.vertices_local[1:, :, :3] = wheel
+        self.vertices_world = np.empty_like(self.vertices_local)
+        # flattened view of the transformed points, [200, 3]
+        self.vertices = self.vertices_world.reshape(-1, 4)[:, :3]
+
+        # first vertex of each wheel curve, FL1, FL2, FR1, FR2, ...
+        curve_starts = (np.arange(1, 5)[:, None] * block +
+                        np.array([0, num_points])).reshape(-1)
+        self.wheel_curve_strips = curve_starts[:, None] + np.arange(num_points)
+
+        # wheel lines in the width direction, four per wheel, shifting with the phase
+        interval = num_points // 4
+        phases = np.arange(interval)[:, None, None]
+        points1 = curve_starts[::2][None, :, None] + phases + interval * np.arange(4)
+        self.wheel_line_phases = np.stack([points1, points1 + num_points],
+                                          axis=-1).reshape(interval, -1, 2)
+
+        # Transform matrices, body then FL, FR, RL, RR wheels
+        self.T_stack = np.tile(np.eye(4), (5, 1, 1))
+        self.T_body = self.T_stack[0]
+        self.T_wheels = self.T_stack[1:]
+        # wheel frame to car frame, rotation updated with the wheel orientations
+        self.T_steer = np.tile(np.eye(4), (4, 1, 1))
+        self.T_steer[:, :3, 3] = self.wheel_centers_local
+
+        # the projection keeps the lengths (times scale_factor), so the drawing of
+        # the car is within a square of its diameter, plus margins
+        diameter = 2 * np.max(np.linalg.norm(np.vstack([
+            corners, self.wheel_centers_local + self.wheel_radius + self.wheel_width]), axis=1))
+        self.sprite_size = int(np.ceil(diameter * gf.scale_factor)) + 4
+        self.sprite_image = None  # allocated when first drawn as a sprite
+        self.sprite_rect = pygame.Rect(0, 0, 0, 0)
+        self.sprite_state = None
 
     def wheel_spinning_animation(self):
         """
@@ -173,144 +136,98 @@ class Car:
         Each wheel has two curves, each curve has 20 points.
         Take 4 points from each curve, and draw lines between them.
         """
-        wheel_line_interval = int(20/4)
+        wheel_line_interval = len(self.wheel_line_phases)
         if self.moving_fwd or self.moving_bwd:
             # update wheel lines
             self.wheel_phi_counter += 1
             if self.wheel_phi_counter == wheel_line_interval:
-                # 20 is the wheel line density
                 self.wheel_phi_counter = 0
-        j = self.wheel_phi_counter
-
-        self.wheel_lines = []
-        for i in range(4):  # four wheels
-            # wheel lines in width direction
-            # Keep four lines, keep updating
-            curve1 = self.wheel_curves[i][0]
-            curve2 = self.wheel_curves[i][1]
-
-            points1 = np.array([curve1[j],
-                                curve1[j + wheel_line_interval * 1],
-                                curve1[j + wheel_line_interval * 2],
-                                curve1[j + wheel_line_interval * 3]])
-            points2 = np.array([curve2[j],
-                                curve2[j + wheel_line_interval * 1],
-                                curve2[j + wheel_line_interval * 2],
-                                curve2[j + wheel_line_interval * 3]])
-
-            self.wheel_lines.append([points1, points2])
-
-    def update_trans_mat(self):
+
+        self.wheel_line_segments = self.wheel_line_phases[self.wheel_phi_counter]
+
+    def update_trans_mat(self, car_origin3d=None, car_orientation=None):
         """
         For each wheel:
-            T_1: wheel frame (rotation)
-            T_2: wheel frame to car frame (translation)
+            T_steer: wheel frame to car frame (rotation then translation)
             T_body: car frame to global frame
+        Written in place into T_stack.
+        :param car_origin3d, car_orientation: pose of the body, the current one if None
         """
-        R = gf.rotation(self.car_orientation, 'z')
-        self.T_body = gf.add_translation(R, self.car_origin3d)
-        for i in range(4):
-            R = gf.rotation(self.wheels_orientation[i], 'z')
-            T_1 = gf.add_translation(R)
-
-            T_2 = gf.add_translation(np.eye(3), self.wheel_centers_local[i])
-            T_CW = np.matmul(T_2, T_1)
-            self.T_wheels[i] = np.matmul(self.T_body, T_CW)
-
-    def apply_transformations(self):
-        self.update_trans_mat()
-
-        self.body_lines = []
-        self.wheel_curves = []
+        if car_origin3d is None:
+            car_origin3d, car_orientation = self.car_origin3d, self.car_orientation
+        c = np.cos(car_orientation)
+        s = np.sin(car_orientation)
+        self.T_body[:2, :2] = [[c, -s], [s, c]]
+        self.T_body[:3, 3] = car_origin3d
+
+        c = np.cos(self.wheels_orientation)
+        s = np.sin(self.wheels_orientation)
+        self.T_steer[:, 0, 0] = c
+        self.T_steer[:, 0, 1] = -s
+        self.T_steer[:, 1, 0] = s
+        self.T_steer[:, 1, 1] = c
+        np.matmul(self.T_body, self.T_steer, out=self.T_wheels)
+
+    def apply_transformations(self, car_origin3d=None, car_orientation=None):
+        self.update_trans_mat(car_origin3d, car_orientation)
+
+        # one batched transform for all blocks of the vertex buffer
+        np.matmul(self.vertices_local, self.T_stack.transpose(0, 2, 1),
+                  out=self.vertices_world)
+
+    @property
+    def body_lines(self):
+        """
+        12 line segments of the car body in global frame, [12, 2, 3]
+        """
+        return self.vertices[self.body_segments]
 
-        # apply transformation matrix T to each body line segment
-        for line in self.body_lines_local:
-            line = line.T
-            line = np.vstack([line, np.ones(line.shape[1])])
-            line_universe = np.matmul(self.T_body, line).astype(np.int32)  # [4, 2], 4=[x, y, z, 1], 2=[p1, p2]
-            self.body_lines.append(line_universe[:3, :].T)
+    def step_back(self):
+        super().step_back()
+        self.car_origin2d = gf.point_3d_to_2d(*self.car_origin3d, R=self.R_view,
+                                              offset=self.offset)
+        self.hold_pose()
 
-        # apply transformation matrix T to each wheel curve
-        for i in range(4):
-            # all points should be in wheel frame
-            curve1 = self.wheel_curves_local[i][0] - self.wheel_centers_local[i].reshape(3, 1)
-            curve2 = self.wheel_curves_local[i][1] - self.wheel_centers_local[i].reshape(3, 1)
-            curve1 = np.vstack([curve1, np.ones(curve1.shape[1])])
-            curve2 = np.vstack([curve2, np.ones(curve2.shape[1])])
-            curve1_universe = np.matmul(self.T_wheels[i], curve1).astype(np.float32)
-            curve2_universe = np.matmul(self.T_wheels[i], curve2).astype(np.float32)
-            self.wheel_curves.append([curve1_universe[:3, :].T, curve2_universe[:3, :].T])
+    def hold_pose(self):
+        """
+        Start the interpolation from the current pose, see interpolate
+        """
+        self.prev_origin3d = self.car_origin3d.copy()
+        self.prev_orientation = self.car_orientation
 
-    def step_back(self):
-        self.car_origin3d = self.last_car_origin3d.copy()
-        self.car_origin2d = self.last_car_origin2d
-        self.car_orientation = self.last_orientation
+    def interpolate(self, alpha):
+        """
+        Draw the car between its poses before and after the last step, so that it
+        moves smoothly when a frame runs more or fewer steps than one.
+        :param alpha: fraction of a step the real time is ahead of the simulation
+        """
+        origin = self.prev_origin3d + alpha * (self.car_origin3d - self.prev_origin3d)
+        orientation = self.prev_orientation + \
+            alpha * (self.car_orientation - self.prev_orientation)
+        self.apply_transformations(origin, orientation)
 
     def update(self):
         """
         Capture car moving from keyboard input and move the T matrices for car and wheels.
+        Advances the car by one fixed timestep of Settings.physics.
         """
         self.R_view = self.workspace.R_view
         self.offset = self.workspace.map_pos + self.settings.map_screen['topleft']
 
+        self.hold_pose()
         if self.game_stats.car_freeze:
             # stop updating
             return
 
-        moving = True if (self.moving_fwd or self.moving_bwd) else False
-        turning = True if (self.turning_left or self.turning_right) else False
-
-        max_speed = self.settings.car['max_speed']
-
-        acc = self.settings.car['acc']
-        acc *= 1 if self.moving_fwd else -1
-
-        psi_dot = self.settings.car['steering_speed']
-        psi_dot *= 1 if self.turning_left else -1
-
-        if moving:
-            if np.abs(self.car_speed) < max_speed:
-                self.car_speed += acc
-        else:  # slow down
-            self.car_speed *= 0.99
-
-        if turning:
-            self.car_speed *= 0.95  # slow down
-            if np.abs(self.steering_angle) < self.settings.car['max_steer']:
-                self.steering_rate = psi_dot
-            else:
-                self.steering_rate = 0
-        else:
-            self.steering_rate = 0
-            # steering wheel returns to initial position
-            self.steering_angle *= 0.94 if moving else 0.98
-
-        if self.brake:
-            self.car_speed *= 0.9
-
-        # after getting inputs (speed, steering rate), feed to inverse kinematics
-        calc_inverse(self)
-
-        if np.any(np.abs(self.car_origin3d - self.last_car_origin3d) >= 1):
-            self.last_car_origin3d = self.car_origin3d.copy()
-            self.last_car_origin2d = self.car_origin2d
-            self.last_orientation = self.car_orientation
-
-        self.car_origin3d[0] += self.P_i_dot[0]  # x
-        self.car_origin3d[1] += self.P_i_dot[1]  # y
-        self.car_orientation += self.P_i_dot[2]  # theta
-        self.steering_angle += self.P_i_dot[3]  # phi
+        # the map limits only apply in the game, the window ones in developer mode
+        physics = self.settings.physics
+        self.step(physics['dt'], self.game_stats.game_active, physics['substeps'],
+                  physics['integrator'])
         self.car_origin2d = gf.point_3d_to_2d(*self.car_origin3d, R=self.R_view,
                                               offset=self.offset)
 
         # one step back if car out of game window:
-        if self.game_stats.game_active:
-            if (self.car_origin3d[0] > self.settings.map_screen['xlim'] + 20) or \
-                    (self.car_origin3d[0] < -20) or \
-                    (self.car_origin3d[1] > self.settings.map_screen['ylim'] + 20) or \
-                    (self.car_origin3d[1] < -20):
-                self.step_back()
-        else:
+        if not self.game_stats.game_active:
             if (self.car_origin2d[0] > self.settings.main_screen['w'] - 10) or \
                     (self.car_origin2d[0] < 10) or \
                     (self.car_origin2d[1] > self.settings.main_screen['h'] - 10) or \
@@ -321,33 +238,54 @@ class Car:
 
     def draw(self):
         self.wheel_spinning_animation()
-        for line in self.body_lines:
-            gf.draw_line(self.screen, line, R=self.R_view,
-                         offset=self.offset)
-        for i in range(4):  # four wheels
-            # wheel curves
-            # each wheel has two line segments
-            curve1 = self.wheel_curves[i][0]
-            curve2 = self.wheel_curves[i][1]
-            for j in range(len(curve1)-1):  # iterate through points
-                point1 = curve1[j]
-                point2 = curve1[j+1]
-                gf.draw_line(self.screen, [point1, point2], (255, 0, 0), R=self.R_view,
-                             offset=self.offset)
-
-                point1 = curve2[j]
-                point2 = curve2[j+1]
-                gf.draw_line(self.screen, [point1, point2], (255, 0, 0), R=self.R_view,
-                             offset=self.offset)
-
-            # wheel lines
-            line1 = self.wheel_lines[i][0]
-            line2 = self.wheel_lines[i][1]
-            for j in range(4):
-                point1 = line1[j]
-                point2 = line2[j]
-                gf.draw_line(self.screen, [point1, point2], (0, 0, 255), R=self.R_view,
-                             offset=self.offset)
+
+        # project all points of the car with one matmul
+        points_2d = gf.points_3d_to_2d(self.vertices, R=self.R_view, offset=self.offset)
+        self.draw_points(self.screen, points_2d)
+
+    def draw_sprite(self):
+        """
+        Draw the car on its own transparent surface (sprite_image) instead of the screen,
+        placed at sprite_rect in the screen coordinates.
+        :return: if the drawing changed since the last call
+        """
+        self.wheel_spinning_animation()
+
+        points_2d = gf.points_3d_to_2d(self.vertices, R=self.R_view, offset=self.offset)
+        sprite_state = (points_2d.tobytes(), self.wheel_phi_counter)
+        if sprite_state == self.sprite_state:
+            return False
+        self.sprite_state = sprite_state
+
+        # one pixel margin for the line widths
+        topleft = np.floor(np.min(points_2d, axis=0)) - 1
+        size = np.ceil(np.max(points_2d, axis=0) - topleft) + 2
+        if self.sprite_image is None:
+            self.sprite_image = pygame.Surface((self.sprite_size, self.sprite_size),
+                                               pygame.SRCALPHA)
+        self.sprite_image.fill((0, 0, 0, 0))
+        self.draw_points(self.sprite_image, points_2d - topleft)
+        self.sprite_rect = pygame.Rect(topleft, np.minimum(size, self.sprite_size))
+        return True
+
+    def draw_points(self, surface, points_2d):
+        """
+        :param points_2d: [200, 2] projected vertices of the car
+        """
+        # body: top and bottom rectangles, then the 4 vertical edges
+        corners_2d = points_2d[:8]
+        pygame.draw.lines(surface, (0, 0, 0), True, corners_2d[:4])
+        pygame.draw.lines(surface, (0, 0, 0), True, corners_2d[4:])
+        for i in range(4):
+            pygame.draw.line(surface, (0, 0, 0), corners_2d[i], corners_2d[i + 4])
+
+        # wheel curves, each wheel has two curves
+        for curve in points_2d[self.wheel_curve_strips]:
+            pygame.draw.lines(surface, (255, 0, 0), False, curve)
+
+        # wheel lines, connecting the two curves of each wheel
+        for point1, point2 in points_2d[self.wheel_line_segments]:
+            pygame.draw.line(surface, (0, 0, 255), point1, point2)
 
 
 class LargeCar(Car):
@@ -10,6 +10,7 @@ import numpy as np
 import cv2
 
 from game_function import resource_path
+from tools_cv import select_pyramid_level
 
 
 class ControlPanel:
@@ -28,6 +29,14 @@ class ControlPanel:
         self.img_steer = pygame.image.load(asset_url)
 
         self.draw_frame()
+        self.prepare_zoom_window()
+
+        # inputs of the zoomed-in map and the steering wheel when they were last
+        # rendered, so they are only re-rendered when changed
+        self.zoom_state = None
+        self.steering_state = None
+        self.zoom_changed = True
+        self.steering_changed = True
 
     def process_keyboard_imgs(self):
         # imgs_arrow = [pygame.image.load(
@@ -80,8 +89,11 @@ class ControlPanel:
             # pos = (pos[0] - text_width // 2, pos[1] - text_height // 2)
             # self.frame.blit(X, pos)
 
+    def get_steering_angle(self):
+        return self.settings.car['steering_ratio'] * self.car.steering_angle * 180 / np.pi
+
     def update_steering_wheel(self):
-        angle = self.settings.car['steering_ratio'] * self.car.steering_angle * 180 / np.pi
+        angle = self.get_steering_angle()
         img_rotated = pygame.transform.rotate(self.img_steer,
                                               -angle)
         img_scaled = pygame.transform.scale(img_rotated,
@@ -89,100 +101,152 @@ class ControlPanel:
                                              self.settings.steering_wheel['h']))
         self.steering_wheel_sur = img_scaled
 
-    def update_zoomed_map(self):
+    def get_zoom_state(self):
+        """
+        Inputs of the zoomed-in map. The car pose is rounded so that the map
+        moves by less than a quarter pixel between two different states.
+        """
         r = self.zoom_settings['window_radius']
-        w = r * 2
-        h = r * 2
-        topleft = self.zoom_settings['topleft']
         zoom_factor = self.zoom_settings['factor']
+        if self.zoom_settings['3d']:
+            pos = self.car.car_origin2d
+            pixel = 1 / zoom_factor / zoom_factor  # map pixels per zoomed-in pixel
+            view = self.workspace.view_key
+        else:
+            pos = self.car.car_origin3d[:2]
+            pixel = 1 / zoom_factor / 0.15
+            view = None
+        pos = tuple(np.round(np.asarray(pos) / (pixel / 4)).astype(np.int64))
+        if self.zoom_settings['car_fixed']:
+            # quarter pixel at the edge of the window
+            angle = int(np.round(self.car.car_orientation / (0.25 / r)))
+        else:
+            angle = None
+        return (zoom_factor, self.zoom_settings['3d'], self.zoom_settings['car_fixed'],
+                view, pos, angle)
 
-        zoom_map_sur = pygame.Surface((w, h))
+    def prepare_zoom_window(self):
+        """
+        Buffers of the zoomed-in map, allocated once per window radius.
+        The buffer is in the [x, y] layout of pygame.surfarray.
+        """
+        r = self.zoom_settings['window_radius']
+        self.zoom_radius = r
+        self.zoom_map_sur = pygame.Surface((2 * r, 2 * r))
+        self.zoom_map_rect = self.zoom_map_sur.get_rect(topleft=self.zoom_settings['topleft'])
+        self.zoom_buffer = np.empty((2 * r, 2 * r, 3), dtype=np.uint8)
+        # map region under the window, the mip level has less than 2 map pixels
+        # per window pixel, the window may be rotated. Zoomed out beyond the
+        # coarsest level, the region is at most that whole level.
+        size = 2 * (int(np.ceil(2 * r * np.sqrt(2))) + 2)
+        size = max(size, max(self.workspace.pyramid[-1].shape[:2]))
+        self.zoom_region_buffer = np.empty((size, size, 3), dtype=np.uint8)
+
+        # white outside the circular window
+        inside = np.zeros((2 * r, 2 * r), dtype=np.uint8)
+        cv2.circle(inside, (r, r), r, 1, -1)
+        self.zoom_outside = np.repeat(inside[:, :, None] == 0, 3, axis=2)
+
+    def update_zoomed_map(self):
+        """
+        Crop, scale and rotate the map around the car with a single warp
+        into the preallocated buffer, then copy it to the persistent surface.
+        """
+        r = self.zoom_settings['window_radius']
+        if r != self.zoom_radius:
+            self.prepare_zoom_window()
+        zoom_factor = self.zoom_settings['factor']
 
-        # Cropping settings
         if self.zoom_settings['3d']:
             zoom_radius = r / zoom_factor / zoom_factor
-            img = self.workspace.map3d.astype(np.uint8)
+            pyramid = self.workspace.map3d_pyramid  # [x, y] layout
             # car center relative to map screen
             car_center = (self.car.car_origin2d[0] - self.settings.map_screen['topleft'][0],
                           self.car.car_origin2d[1] - self.settings.map_screen['topleft'][1])
             calibration_angle = 90
+            flip = 1
         else:
             zoom_radius = r / zoom_factor / 0.15
-            img = self.workspace.map2d
-            car_center = self.car.car_origin3d + self.workspace.pad_size
-            car_center[0], car_center[1] = car_center[1], car_center[0]
+            pyramid = self.workspace.pyramid  # tiled, [y, x] layout, the window is flipped
+            car_center = self.car.car_origin3d[[1, 0]]
             calibration_angle = 0
+            flip = -1
 
         if self.car.car_origin3d[0] < - zoom_radius or \
                 self.car.car_origin3d[0] > self.settings.map_screen['xlim'] + zoom_radius or \
                 self.car.car_origin3d[1] < - zoom_radius or \
                 self.car.car_origin3d[1] > self.settings.map_screen['ylim'] + zoom_radius:
             # if the car outside the map (white area)
-            zoom_map_sur.fill((255, 255, 255))
+            self.zoom_buffer.fill(255)
         else:
-            # Pre-crop: (Rectangular)
-            start_row = np.round(car_center[0] - zoom_radius).astype(np.int32)
-            start_col = np.round(car_center[1] - zoom_radius).astype(np.int32)
-            end_row = np.round(car_center[0] + zoom_radius).astype(np.int32)
-            end_col = np.round(car_center[1] + zoom_radius).astype(np.int32)
-            pre_cropped = img[start_row:end_row, start_col:end_col]
-            # print(start_row, end_row, start_col, end_col)
-            # points3d = [[start_col, start_row, 0],
-            #             [end_col, start_row, 0],
-            #             [start_col, end_row, 0],
-            #             [end_col, end_row, 0]]
-
-            # Resize
-            scaled = cv2.resize(pre_cropped, (w, h),
-                                interpolation=cv2.INTER_LINEAR)
-            # Circular crop
-            mask = np.zeros_like(scaled, dtype=np.uint8)
-            mask = cv2.circle(mask, (w // 2, h // 2), r, (255, 255, 255), -1)
-            mask = cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
-            cropped = cv2.bitwise_and(scaled, scaled, mask=mask)
-
-            # Convert black pixels caused by cropping to white
-            gray = cv2.cvtColor(cropped, cv2.COLOR_BGR2GRAY)
-            black_pixels = np.where(gray == 0)
-            res = cropped.copy()
-            res[black_pixels] = [255, 255, 255]
+            if self.zoom_settings['car_fixed']:
+                # rotate the zoomed-in map as car steering
+                angle = self.car.car_orientation + calibration_angle * np.pi / 180
+            else:
+                angle = (calibration_angle - 90) * np.pi / 180
 
-            if not self.zoom_settings['3d']:
-                res = np.fliplr(res)
+            # sample from the mip level with about one map pixel per window pixel,
+            # so the cost and the aliasing do not grow when zooming out
+            level = select_pyramid_level(pyramid, r / zoom_radius)
+            f = 2 ** level
 
-            # Fill image to surface
-            pygame.surfarray.blit_array(zoom_map_sur, res)
+            # window pixel [x, y] (offset v from the window center) samples the
+            # map at car_center + A v, A: rotation, flip then scaling to the map
+            c, s = np.cos(angle), np.sin(angle)
+            A = zoom_radius / r * np.array([[c, -s], [flip * s, flip * c]])
+            # cv2 indexes both images in (column, row) order,
+            # pixel centers of level l are at (level 0 position + 0.5) / 2^l - 0.5
+            M = np.empty((2, 3))
+            M[:, :2] = A[::-1, ::-1] / f
+            M[:, 2] = np.asarray(car_center)[::-1] / f - 0.5 - M[:, :2].sum(axis=1) * (r - 0.5)
 
-            if self.zoom_settings['car_fixed']:
-                # Rotate zoomed-in map surface as car steering
-                angle = self.car.car_orientation * 180 / np.pi + calibration_angle
-                zoom_map_sur = pygame.transform.rotate(zoom_map_sur, angle)
+            img = pyramid[level]
+            if not self.zoom_settings['3d']:
+                # only the tiles under the window are read, into the region buffer.
+                # The region is clipped to the level, the warp fills the rest white.
+                half = int(np.ceil(zoom_radius / f * np.sqrt(2))) + 2
+                top, left = np.floor(np.asarray(car_center) / f).astype(np.int64) - half
+                h, w = img.shape[:2]
+                y0, x0 = max(top, 0), max(left, 0)
+                y1, x1 = min(top + 2 * half, h), min(left + 2 * half, w)
+                img = None if y1 <= y0 or x1 <= x0 else \
+                    img.read_region(y0, x0, y1 - y0, x1 - x0,
+                                    out=self.zoom_region_buffer[:y1 - y0, :x1 - x0])
+                M[:, 2] -= (x0, y0)
+            if img is None:  # the window is off the map
+                self.zoom_buffer.fill(255)
             else:
-                zoom_map_sur = pygame.transform.rotate(zoom_map_sur, calibration_angle - 90)
+                cv2.warpAffine(img, M, (2 * r, 2 * r), dst=self.zoom_buffer,
+                               flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=(255, 255, 255))
+                np.copyto(self.zoom_buffer, 255, where=self.zoom_outside)
 
-        # rotation will change the surface center if the surface is aligned at top left corner
-        self.zoom_map_rect = zoom_map_sur.get_rect()
-        self.zoom_map_rect.center = (topleft[0] + r,
-                                     topleft[1] + r)
-        self.zoom_map_sur = zoom_map_sur
+        pygame.surfarray.blit_array(self.zoom_map_sur, self.zoom_buffer)
 
     def update(self):
-        self.update_zoomed_map()
-        if not self.game_stats.car_freeze:
-            self.update_steering_wheel()
-
-    def draw(self):
-        self.screen.blit(self.steering_wheel_sur,
-                         self.settings.steering_wheel['topleft'])
+        zoom_state = self.get_zoom_state()
+        self.zoom_changed = zoom_state != self.zoom_state
+        if self.zoom_changed:
+            self.zoom_state = zoom_state
+            self.update_zoomed_map()
 
-        self.screen.blit(self.zoom_map_sur, self.zoom_map_rect)
-        self.screen.blit(self.frame, self.zoom_settings['topleft'])
-
-        self.draw_keyboard_panel()
+        self.steering_changed = False
+        if not self.game_stats.car_freeze:
+            # quarter degree steps
+            steering_state = int(np.round(self.get_steering_angle() * 4))
+            self.steering_changed = steering_state != self.steering_state
+            if self.steering_changed:
+                self.steering_state = steering_state
+                self.update_steering_wheel()
 
-    def draw_keyboard_panel(self):
+    def get_keyboard_imgs(self):
+        """
+        Images of the 4 arrow keys and the space key with their topleft positions,
+        the pressed keys are shifted
+        """
         car_motion = [self.car.moving_fwd, self.car.moving_bwd,
                       self.car.turning_right, self.car.turning_left]
+        keys = []
         for i in range(4):
             if car_motion[i]:
                 img = self.imgs_arrow_pressed[i]
@@ -192,7 +256,7 @@ class ControlPanel:
             else:
                 img = self.imgs_arrow[i]
                 topleft = self.key_settings['arrows_topleft'][i]
-            self.screen.blit(img, topleft)
+            keys.append((img, topleft))
 
         if self.car.brake:
             img = self.img_space_pressed
@@ -201,4 +265,5 @@ class ControlPanel:
         else:
             img = self.img_space
             topleft = self.key_settings['space_topleft']
-        self.screen.blit(img, topleft)
+        keys.append((img, topleft))
+        return keys
@@ -11,7 +11,9 @@ import numpy as np
 import pygame
 import time
 
+import text_cache
 from settings import Settings
+from tools_geometry import rotation
 
 my_settings = Settings()
 
@@ -166,73 +168,55 @@ def wait_key_press(key):
                     return
 
 
-def detect_collision(game_stats, screen, car, large_car, workspace, manipulator):
-    if car.car_origin3d[0] < 1000 or car.car_origin3d[0] > 4000 or \
-            car.car_origin3d[1] < 500 or car.car_origin3d[1] > 2500:
+def detect_collision(game_stats, car, large_car, workspace, manipulator, sim_clock):
+    """
+    Check the car against the track after each step of the simulation
+    :param sim_clock: SimulationClock, the pauses of the game are not simulated
+    """
+    track = workspace.track
+    if not track.in_area(car.car_origin3d):
+        game_stats.clearance = None
         return
 
-    red_line = workspace.red_line
-    start_mask = workspace.start_mask
-    end_mask = workspace.end_mask
-
-    # get 3d corner points
-    # FL = np.round(car.body_lines[0][0][:2]).astype(np.int32)  # FL
-    # FR = np.round(car.body_lines[1][0][:2]).astype(np.int32)  # FR
-    # RL = np.round(car.body_lines[3][0][:2]).astype(np.int32)  # RL
-    # RR = np.round(car.body_lines[2][0][:2]).astype(np.int32)  # RR
-    FL = car.body_lines[0][0][:2]
-    FR = car.body_lines[1][0][:2]
-    RL = car.body_lines[3][0][:2]
-    RR = car.body_lines[2][0][:2]
-
-    def _get_line(corner1, corner2):
-        line = [np.linspace(corner1[0], corner2[0], 10),
-                np.linspace(corner1[1], corner2[1], 10)]
-
-        return np.round(line).astype(np.int32)
-
-    edges = np.concatenate([_get_line(FL, FR),
-                            _get_line(FR, RR),
-                            _get_line(RR, RL),
-                            _get_line(RL, FL)], axis=1).T
-
     # ============================= check collision with red line =============================
-    pos2d = point_3d_to_2d(game_stats.collision_point[0], game_stats.collision_point[1], 0,
-                           R=car.R_view, offset=car.offset)
-    font = pygame.font.Font(None, 38)
-    X = font.render('x', True, (0, 0, 0))
-    text_width, text_height = X.get_size()
-    topleft = (pos2d[0] - text_width // 2,
-               pos2d[1] - text_height // 2)
-    if game_stats.car_freeze:
-        # if collision with red line
-        screen.blit(X, topleft)
-
-    if np.any(red_line[edges[:, 1], edges[:, 0]]):
-        collision_point = edges[np.argwhere(red_line[edges[:, 1], edges[:, 0]])][0][0]
-        game_stats.collision_point = collision_point
+    # the marker is shown at the collision point while the car is frozen,
+    # or for one frame in developer mode
+    show_marker = game_stats.car_freeze
+
+    game_stats.clearance, collision_point = track.check(car.footprint())
+    if collision_point is not None:
+        game_stats.collision_point = np.round(collision_point).astype(np.int32)
 
         if game_stats.game_active:
             game_stats.car_freeze = True
             car.reset_motion()
             large_car.moving_fwd = False  # suppress wheel spinning
         else:  # short blit
-            screen.blit(X, topleft)
+            show_marker = True
+
+    if show_marker:
+        pos2d = point_3d_to_2d(game_stats.collision_point[0], game_stats.collision_point[1], 0,
+                               R=car.R_view, offset=car.offset)
+        X = text_cache.render('x', 38, (0, 0, 0))
+        text_width, text_height = X.get_size()
+        game_stats.collision_marker = (pos2d[0] - text_width // 2,
+                                       pos2d[1] - text_height // 2)
 
     if not game_stats.started:
         # ============================= check collision with blue start mask =============================
-        if start_mask[int(car.car_origin3d[1]),
-        int(car.car_origin3d[0])]:
+        if track.at_start(car.car_origin3d):
             car.reset_positions('start')
             car.reset_motion()
             game_stats.started = True
             large_car.moving_fwd = False  # suppress wheel spinning
+            # plan the manipulator trajectory ahead of reaching the end
+            manipulator.plan_trajectory()
             time.sleep(0.3)
-            game_stats.start_time = pygame.time.get_ticks()
+            sim_clock.skip()
+            game_stats.start_time = game_stats.sim_time
     else:
         # ============================= check collision with blue end mask =============================
-        if end_mask[int(car.car_origin3d[1]),
-        int(car.car_origin3d[0])]:
+        if track.at_end(car.car_origin3d):
             car.reset_positions('end')
             car.reset_motion()
             game_stats.started = False
@@ -240,85 +224,11 @@ def detect_collision(game_stats, screen, car, large_car, workspace, manipulator)
             manipulator.init_trajectory()
             large_car.moving_fwd = False  # suppress wheel spinning
 
-            game_stats.current_time_score = (pygame.time.get_ticks() - game_stats.start_time)
+            game_stats.current_time_score = game_stats.sim_time - game_stats.start_time
             if game_stats.best_time_score is None:
                 game_stats.best_time_score = game_stats.current_time_score
             elif game_stats.current_time_score < game_stats.best_time_score:
                 game_stats.best_time_score = game_stats.current_time_score
-            time.sleep(0.3)
-
-
-def draw_switch(screen, switch_buttons, game_stats):
-    if game_stats.game_active:  # developer mode disabled
-        switch_buttons[1].draw_button()
-    else:  # developer mode enabled
-        switch_buttons[0].draw_button()
-    font = pygame.font.Font(None, 25)
-    text = font.render('Developer Mode', True, (0, 0, 0))
-    text_width, text_height = text.get_size()
-    pos = switch_buttons[0].center
-    pos = (pos[0] - text_width // 2,
-           pos[1] - text_height // 2 - 25)
-    screen.blit(text, pos)
-
-
-def update_screen(settings, game_stats, screen1, screen2,
-                  workspace, car, large_car, zoom_buttons, restart_button,
-                  trimetric_button, axes_buttons, switch_buttons,
-                  latex_window, control_panel, msg_box, manipulator):
-    screen1.fill(settings.screen1['bg_color'])
-    screen2.fill(settings.screen2['bg_color'])
-
-    # screen 1
-    workspace.draw()
-    car.draw()
-
-    # screen 2
-    control_panel.draw()
-    large_car.draw()
-    latex_window.draw()
-    msg_box.show_msg()
-
-    if game_stats.manipulator:
-        manipulator.draw()
-
-    # buttons
-    for button in zoom_buttons:
-        button.draw_button()
-    for button in axes_buttons:
-        button.draw_button()
-    draw_switch(screen1, switch_buttons, game_stats)
-    restart_button.draw_button()
-    trimetric_button.draw_button()
-
-    detect_collision(game_stats, screen1, car, large_car,
-                     workspace, manipulator)
-
-
-def rotation(theta, direction):
-    if direction == 'x':
-        R = np.array([[1, 0, 0],
-                      [0, np.cos(theta), -np.sin(theta)],
-                      [0, np.sin(theta), np.cos(theta)]])
-    elif direction == 'y':
-        R = np.array([[np.cos(theta), 0, np.sin(theta)],
-                      [0, 1, 0],
-                      [-np.sin(theta), 0, np.cos(theta)]])
-    elif direction == 'z':
-        R = np.array([[np.cos(theta), -np.sin(theta), 0],
-                      [np.sin(theta), np.cos(theta), 0],
-                      [0, 0, 1]])
-    else:
-        raise ValueError('Direction should be x, y or z')
-    return R
-
-
-def add_translation(R, t=np.array([0, 0, 0, 1])):
-    if len(t) == 3:
-        t = np.hstack([t, 1])
-    T = np.vstack([R, np.array([[0, 0, 0]])])
-    T = np.hstack([T, t.reshape(-1, 1)])
-    return T
 
 
 def trimetric_view():
@@ -334,18 +244,6 @@ def trimetric_view():
 R_trimetic = trimetric_view()
 
 
-def draw_line(screen, line, color=(0, 0, 0), linewidth=1, R=R_trimetic, offset=(0, 0)):
-    p1 = line[0]
-    p2 = line[1]
-
-    p1_2d = point_3d_to_2d(p1[0], p1[1], p1[2], R, offset=offset)
-    p2_2d = point_3d_to_2d(p2[0], p2[1], p2[2], R, offset=offset)
-
-    pygame.draw.line(screen, color, p1_2d, p2_2d, linewidth)
-
-    return p1_2d, p2_2d
-
-
 def point_3d_to_2d(x, y, z, R=R_trimetic, offset=(0, 0)):
     # flip y-axis for visualisation,
     # so anticlockwise becomes negative and clockwise becomes positive
@@ -361,6 +259,22 @@ def point_3d_to_2d(x, y, z, R=R_trimetic, offset=(0, 0)):
     return x_2d, y_2d
 
 
+def points_3d_to_2d(points, R=R_trimetic, offset=(0, 0)):
+    """
+    Batched version of point_3d_to_2d, projecting all points with one matmul.
+    :param points: [N, 3] points in 3D
+    :return: [N, 2] points on the screen
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    # same y-axis flip and scaling as point_3d_to_2d, folded into the projection
+    proj = R[:2] * (scale_factor * np.array([1, -1, 1]))
+    points_2d = np.matmul(points, proj.T)
+    points_2d[:, 0] += offset[0]
+    points_2d[:, 1] = offset[1] - points_2d[:, 1]
+
+    return points_2d
+
+
 def cv2_to_pygame(image):
     # Rotate and flip to convert cv2 to pygame
     image = np.fliplr(image)
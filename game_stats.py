@@ -17,8 +17,11 @@ class GameStats:
         # for collision detection
         self.car_freeze = False
         self.collision_point = [0, 0, 0]
+        self.clearance = None  # distance between the car and the red line, in pixels
+        self.collision_marker = None  # topleft of the 'x' marker on screen1, if shown
 
-        # timer
+        # timer, in ms of simulated time (SimulationClock steps), not of real time
+        self.sim_time = 0
         self.start_time = 0
         self.best_time_score = None
         self.current_time_score = None
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# @File    : import_report.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+"""
+Startup report: import time of the game entry point, per module, from
+python -X importtime. Exits with status 1 if the total is over the budget.
+    python import_report.py [--module main] [--budget-ms 600] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+BUDGET_MS = 600  # launch-time budget of the imports of main.py
+
+
+def measure_imports(module):
+    """
+    Import the module in a fresh interpreter
+    :return: list of (name, self time, cumulative time) in ms, in import order
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+
+    times = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    times = measure_imports(args.module)
+    total = next(cumulative for name, _, cumulative in times if name == args.module)
+
+    print('%-40s %10s %10s' % ('module', 'self ms', 'cum ms'))
+    for name, self_ms, cumulative_ms in sorted(times, key=lambda t: -t[1])[:args.top]:
+        print('%-40s %10.1f %10.1f' % (name, self_ms, cumulative_ms))
+    print('\nimport %s: %.1f ms (budget %.0f ms)' % (args.module, total, args.budget_ms))
+
+    if total > args.budget_ms:
+        print('over budget', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
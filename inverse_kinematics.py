@@ -8,7 +8,7 @@
 import numpy as np
 from math import sin, cos, tan, atan, sqrt
 
-from game_function import rotation
+from tools_geometry import rotation
 
 
 def calc_inverse(car):
@@ -67,4 +67,50 @@ def calc_inverse(car):
     car.P_i_dot = P_i_dot
 
 
+def calc_inverse_batch(cars):
+    """
+    Batched calc_inverse, for a VehicleBatch (one array entry per vehicle).
+    Same as calc_inverse, the wheel speeds are taken from the previous P_i_dot.
+    """
+    B = cars.width
+    r = cars.wheel_radius
+    l = cars.wheel_base
 
+    theta = cars.car_orientation
+    psi = cars.steering_angle
+    V = cars.car_speed
+    c = np.cos(theta)
+    s = np.sin(theta)
+
+    # Velocity metrix in global frame
+    P_i_dot = np.stack([c * V, s * V, np.tan(psi) / l * V, cars.steering_rate], axis=-1)
+    theta_dot = P_i_dot[:, 2]
+
+    # calculate rear wheels angular velocities, from the velocity in the car frame
+    alpha = np.sqrt(B**2 + 4*l**2) / (2*r * np.sqrt(1+(4*l**2)/B**2))
+    last = cars.P_i_dot
+    u = c * last[:, 0] + s * last[:, 1]
+    vel_RL = u / r - alpha * last[:, 2]
+    vel_RR = u / r + alpha * last[:, 2]
+
+    # straight motion has no instantaneous center of rotation
+    turning = vel_RL != vel_RR
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # calculate instantaneous center of rotation
+        R = np.where(turning, B/2 * ((vel_RL + vel_RR) / (vel_RL - vel_RR)), np.nan)
+
+        # calculate front wheels orientations
+        beta_FL = np.where(turning, -np.arctan(l / (R + B/2)), 0)
+        beta_FR = np.where(turning, -np.arctan(l / (R - B/2)), 0)
+
+        # calculate front wheels angular velocities
+        vel_FL = np.where(turning, np.abs(theta_dot) * np.sqrt(l**2 + (R + B/2)**2) / r, 0)
+        vel_FR = np.where(turning, np.abs(theta_dot) * np.sqrt(l**2 + (R - B/2)**2) / r, 0)
+
+    # update car kinematics
+    cars.ICR = R
+    cars.wheels_orientation[:, 0] = beta_FL
+    cars.wheels_orientation[:, 1] = beta_FR
+    cars.wheels_orientation[:, 2:] = 0
+    cars.wheels_speed[:] = np.stack([vel_FL, vel_FR, vel_RL, vel_RR], axis=-1)
+    cars.P_i_dot = P_i_dot
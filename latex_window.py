@@ -5,19 +5,19 @@
 # @Github  : https://github.com/sunfanyi
 # @Software: PyCharm
 
-import matplotlib
-
-# non-interactive backend to optimise speed
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import os
 import pygame
 import numpy as np
 import io
 
+import text_cache
+from tools_cache import values_digest, cached_bytes
+
 
 class LatexWindow:
     def __init__(self, settings, screen, car):
         self.latex_settings = settings.latex_region
+        self.cache_dir = settings.map_screen['cache_dir']
         self.screen = screen
         self.car = car
 
@@ -27,6 +27,10 @@ class LatexWindow:
                                              self.latex_settings['h']),
                                             pygame.SRCALPHA)
 
+        # value texts shown on surf_updating, only re-rendered when they change
+        self.rendered_texts = None
+        self.changed = True
+
     def get_surf_latex(self):
         x_left = 0.1
         x_right = 1
@@ -57,23 +61,36 @@ class LatexWindow:
 
         # adjust ratio to change figsize, fontsize, DPI to optimise speed
         ratio = 10
-        fig = plt.figure(figsize=(22 * ratio, 20 * ratio))
-        fig.patch.set_visible(False)
-        ax = fig.add_axes([0, 0, 1, 1])
-        ax.axis('off')
 
-        for key, value in text_center_aligned.items():
-            ax.text(value[0], 0.95 - value[1], key, ha='center', va='top', fontsize=108 * ratio)
+        def render():
+            # matplotlib is only needed (and imported) when the image is not cached
+            import matplotlib
+            # non-interactive backend to optimise speed
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+
+            fig = plt.figure(figsize=(22 * ratio, 20 * ratio))
+            fig.patch.set_visible(False)
+            ax = fig.add_axes([0, 0, 1, 1])
+            ax.axis('off')
 
-        for key, value in text_left_aligned.items():
-            ax.text(value[0], 0.95 - value[1], key, ha='left', va='top', fontsize=108 * ratio)
+            for key, value in text_center_aligned.items():
+                ax.text(value[0], 0.95 - value[1], key, ha='center', va='top', fontsize=108 * ratio)
 
-        # in-memory buffer
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=10 // ratio, bbox_inches='tight', pad_inches=0)
-        buf.seek(0)
+            for key, value in text_left_aligned.items():
+                ax.text(value[0], 0.95 - value[1], key, ha='left', va='top', fontsize=108 * ratio)
 
-        self.surf_latex = pygame.image.load(buf)
+            # in-memory buffer
+            buf = io.BytesIO()
+            plt.savefig(buf, format='png', dpi=10 // ratio, bbox_inches='tight', pad_inches=0)
+            plt.close(fig)
+            return buf.getvalue()
+
+        key = values_digest(sorted(text_center_aligned.items()),
+                            sorted(text_left_aligned.items()), ratio)[:16]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        png = cached_bytes(os.path.join(self.cache_dir, 'latex-%s.png' % key), render)
+        self.surf_latex = pygame.image.load(io.BytesIO(png))
 
     def get_surf_units(self):
         self.surf_units = pygame.Surface((self.latex_settings['w'],
@@ -83,14 +100,13 @@ class LatexWindow:
         units = ['m/s', 'rad/s', 'm/s', 'm/s', 'rad/s',
                  'deg', 'rad/s', 'rad/s', 'deg', 'rad/s', 'rad/s']
 
-        font = pygame.font.Font(None, 24)
         rect = self.surf_latex.get_rect()
         w = rect.width
         h = rect.height
         for i, unit in enumerate(units):
             text = unit
 
-            label = font.render(text, True, (0, 0, 0))
+            label = text_cache.render(text, 24, (0, 0, 0))
 
             label_width = label.get_width()
             label_height = label.get_height()
@@ -108,8 +124,6 @@ class LatexWindow:
             2. Left wheels become right wheels, and vice versa.
             3. Wheels' orientation change sign as left turn becomes right turn.
         """
-        self.surf_updating.fill(self.latex_settings['bg_color'])
-
         values = [self.car.car_speed,  # V
                   -self.car.P_i_dot[3],  # dot_psi
 
@@ -125,17 +139,22 @@ class LatexWindow:
                   self.car.wheels_speed[0],  # phi_FR dot
                   self.car.wheels_speed[2]]  # phi_RR dot
 
-        font = pygame.font.Font(None, 24)
+        decimal_3 = [1, 4, 6, 7, 9, 10]
+        texts = ['=  %.3f' % val if i in decimal_3 else '=  %.2f' % val
+                 for i, val in enumerate(values)]
+
+        # nothing to do if the values are the same at display precision
+        self.changed = texts != self.rendered_texts
+        if not self.changed:
+            return
+        self.rendered_texts = texts
+
+        self.surf_updating.fill(self.latex_settings['bg_color'])
         rect = self.surf_latex.get_rect()
         w = rect.width
         h = rect.height
-        decimal_3 = [1, 4, 6, 7, 9, 10]
-        for i, val in enumerate(values):
-            if i in decimal_3:
-                text = '=  %.3f' % val
-            else:
-                text = '=  %.2f' % val
-            label = font.render(text, True, (0, 0, 0))
+        for i, text in enumerate(texts):
+            label = text_cache.render(text, 24, (0, 0, 0))
 
             label_width = label.get_width()
             label_height = label.get_height()
@@ -144,8 +163,3 @@ class LatexWindow:
             pos = (pos_x, pos_y)
 
             self.surf_updating.blit(label, pos)
-
-    def draw(self):
-        self.screen.blit(self.surf_updating, (0, 0))
-        self.screen.blit(self.surf_latex, (0, 0))
-        self.screen.blit(self.surf_units, (0, 0))
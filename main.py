@@ -19,6 +19,8 @@ from game_stats import GameStats
 from control_panel import ControlPanel
 from message_box import MessageBox
 from manipulator import Manipulator
+from renderer import Renderer
+from simulation import SimulationClock
 
 
 def run_game():
@@ -29,12 +31,14 @@ def run_game():
         (settings.main_screen['w'], settings.main_screen['h']))
     pygame.display.set_caption('Mobile Robot')
 
-    screen1 = pygame.Surface((settings.screen1['w'],
-                              settings.screen1['h']),
-                             pygame.SRCALPHA)
-    screen2 = pygame.Surface((settings.screen2['w'],
-                              settings.screen2['h']),
-                             pygame.SRCALPHA)
+    # static content is drawn on the background, the subscreens are parts of it
+    background = pygame.Surface(screen.get_size())
+    screen1 = background.subsurface(
+        pygame.Rect(settings.screen1['topleft'],
+                    (settings.screen1['w'], settings.screen1['h'])).clip(screen.get_rect()))
+    screen2 = background.subsurface(
+        pygame.Rect(settings.screen2['topleft'],
+                    (settings.screen2['w'], settings.screen2['h'])).clip(screen.get_rect()))
 
     workspace = Workspace(settings, screen1)
     my_car = Car(settings, screen1, game_stats, workspace)
@@ -52,8 +56,16 @@ def run_game():
     axes_buttons = [ImgButton(setting, screen) for setting in settings.buts_rot_axes]
     switch_buttons = [ImgButton(setting, screen) for setting in settings.buts_switch]
 
+    renderer = Renderer(settings, screen, background, game_stats, workspace,
+                        my_car, my_large_car, control_panel, latex_window, msg_box,
+                        manipulator, zoom_buttons, restart_button, trimetric_button,
+                        axes_buttons, switch_buttons)
+
     frame_rate = 60
     clock = pygame.time.Clock()
+    # the car is simulated in fixed steps, as many per frame as the frame time takes
+    sim_clock = SimulationClock(settings.physics)
+    frame_time = sim_clock.dt
 
     # # Variables to track frame rate
     # frame_count = 0
@@ -61,16 +73,23 @@ def run_game():
     # start_time = pygame.time.get_ticks()
 
     while True:
-        screen.blit(screen1, settings.screen1['topleft'])
-        screen.blit(screen2, settings.screen2['topleft'])
-        # screen.fill((255, 255, 255))
-
         gf.check_event(settings, game_stats, workspace, my_car, my_large_car,
                        zoom_buttons, restart_button, trimetric_button,
                        axes_buttons, switch_buttons, manipulator)
 
+        steps = sim_clock.advance(frame_time)
+        if steps:
+            # the marker shows the contacts found in any step of the frame
+            game_stats.collision_marker = None
         if not game_stats.manipulator:
-            my_car.update()
+            for _ in range(steps):
+                my_car.update()
+                game_stats.sim_time += sim_clock.dt * 1000
+                gf.detect_collision(game_stats, my_car, my_large_car, workspace,
+                                    manipulator, sim_clock)
+                if game_stats.manipulator:
+                    break
+            my_car.interpolate(sim_clock.accumulator / sim_clock.dt)
             my_large_car.update_zoomed_map(my_car.car_orientation,
                                            my_car.wheels_orientation)
         else:
@@ -80,19 +99,18 @@ def run_game():
         latex_window.update()
         msg_box.update()
 
-        gf.update_screen(settings, game_stats, screen1, screen2,
-                         workspace, my_car, my_large_car, zoom_buttons, restart_button,
-                         trimetric_button, axes_buttons, switch_buttons,
-                         latex_window, control_panel, msg_box, manipulator)
+        dirty_rects = renderer.update()
 
-        pygame.display.update()
+        # only the changed areas are sent to the display
+        pygame.display.update(dirty_rects)
 
         if manipulator.pause:
             gf.wait_key_press(pygame.K_ESCAPE)
             game_stats.manipulator = False
             manipulator.pause = False
+            sim_clock.skip()
 
-        clock.tick(frame_rate)
+        frame_time = clock.tick(frame_rate) / 1000
 
         # frame_count += 1
         # # Calculate the elapsed time and frame rate
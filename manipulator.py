@@ -5,19 +5,24 @@
 # @Github  : https://github.com/sunfanyi
 # @Software: PyCharm
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pygame
 import numpy as np
 import game_function as gf
 import cv2
 
 from car import Car
-from trajectory_planning import get_path, do_trajectory_planning
+from tools_cache import values_digest, cached_array
+from tools_cv import select_pyramid_level
 
 
 class Manipulator:
     final_frames = 60
 
     res = 15  # resolution of trajectory points
+    trail_length = 20  # number of last end effector positions shown
 
     def __init__(self, settings, screen, game_stats, workspace, car):
         self.settings = settings
@@ -35,30 +40,22 @@ class Manipulator:
 
         self._get_3D_map()
         self._get_zoomed_car()
+        self._get_zoom_keyframes()
 
-        self.init_trajectory()
+        # trajectories are planned in the background, see plan_trajectory
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.planning = None  # future of the next trajectory
+        self.ready = False  # if the trajectory of the current sequence is available
+        self.pause = False
 
     def _get_3D_map(self):
-        img = self.workspace.img
-
         # pre-cropped:
         dx = self.window_settings['dx']
         dy = self.window_settings['dy']
         x0 = self.window_settings['x0']
         y0 = self.window_settings['y0']
-        self.zoom_factor = img.shape[0] / dy
+        self.zoom_factor = self.workspace.pyramid[0].shape[0] / dy
 
-        img = img[y0:y0 + dy, x0:x0 + dx]
-
-        img_w = img.shape[1]
-        img_h = img.shape[0]
-
-        # Apply non-affine transformation
-        # corner points from:
-        cornersA = np.float32([[0, 0],
-                               [img_w, 0],
-                               [0, img_h],
-                               [img_w, img_h]])
         # corner points to:
         points3d = [self.settings.map_screen['origin3d'],
                     self.settings.map_screen['xend'],
@@ -70,16 +67,40 @@ class Manipulator:
         cornersB[:, 1] += abs(min(cornersB[:, 1])) + 80
         self.map_pos = cornersB[0]  # top left corner of the map
 
+        # crop from the pyramid level matching the scale of the warp
+        scale = (max(cornersB[:, 0]) - min(cornersB[:, 0])) / dx
+        level = select_pyramid_level(self.workspace.pyramid, scale)
+        f = 2 ** level
+        crop = (slice(y0 // f, (y0 + dy) // f), slice(x0 // f, (x0 + dx) // f))
+        level_h, level_w = self.workspace.pyramid[level].shape[:2]
+        img_h = len(range(*crop[0].indices(level_h)))
+        img_w = len(range(*crop[1].indices(level_w)))
+
+        # Apply non-affine transformation
+        # corner points from:
+        cornersA = np.float32([[0, 0],
+                               [img_w, 0],
+                               [0, img_h],
+                               [img_w, img_h]])
+
         M = cv2.getPerspectiveTransform(cornersA, cornersB)
-        warped = cv2.warpPerspective(img, M, (self.settings.map_screen['w'],
-                                              self.settings.map_screen['h']))
-        warped = gf.cv2_to_pygame(warped)
+        dsize = (self.settings.map_screen['w'], self.settings.map_screen['h'])
+
+        def warp():
+            warped = cv2.warpPerspective(self.workspace.pyramid[level][crop], M, dsize)
+            warped = gf.cv2_to_pygame(warped)
+
+            # Convert black pixels caused by non-affine transformation to white
+            gray = cv2.cvtColor(warped, cv2.COLOR_BGR2GRAY)
+            black_pixels = np.where(gray == 0)
+            map3d = warped.copy()
+            map3d[black_pixels] = [255, 255, 255]
+            return map3d
 
-        # Convert black pixels caused by non-affine transformation to white
-        gray = cv2.cvtColor(warped, cv2.COLOR_BGR2GRAY)
-        black_pixels = np.where(gray == 0)
-        map3d = warped.copy()
-        map3d[black_pixels] = [255, 255, 255]
+        # the same at every launch, saved with the map store
+        key = values_digest(np.round(M, 6).tobytes(), dsize, level, x0, y0, dx, dy)[:16]
+        map3d = cached_array(os.path.join(self.workspace.tiles.store_dir,
+                                          'manipulator-%s.npy' % key), warp)
 
         self.sur_map = pygame.surfarray.make_surface(map3d)
         self.sur_map = pygame.transform.scale(self.sur_map,
@@ -89,7 +110,7 @@ class Manipulator:
         # find blue end position after warp perspective transformation
         point = self.workspace.blue_end
         # blue end poisition relative to the cropped image
-        homo = np.array([point[0] - x0, point[1] - y0, 1])
+        homo = np.array([(point[0] - x0) / f, (point[1] - y0) / f, 1])
 
         # Multiply the homography matrix
         transformed_point = np.matmul(M, homo)
@@ -115,52 +136,110 @@ class Manipulator:
                   zoomed_car.height + zoomed_car.wheel_radius]
         self.manipulator_origin2d = gf.point_3d_to_2d(*origin, offset=self.car_origin2d)
 
-    def init_trajectory(self):
+    def _get_zoom_keyframes(self):
         """
-        Initialise the random trajectory everytime the condition satisfies
+        Mip chain of the map for the zoom-in: each frame is scaled from the
+        smallest keyframe at least as large, into a buffer allocated once
         """
-        self.current_frame = 0
-        self.pause = False
+        self.keyframes = [self.sur_map]
+        while min(self.keyframes[-1].get_size()) >= 32:
+            w, h = self.keyframes[-1].get_size()
+            self.keyframes.append(pygame.transform.smoothscale(self.keyframes[-1],
+                                                               (w // 2, h // 2)))
+        # the zoomed map is the top left part of the buffer
+        self.sur_map_scaled = pygame.Surface(self.sur_map.get_size())
+        self.scaled_size = (0, 0)
+        self.map_changed = False
+        self.robot_changed = False  # the robot is only drawn once the zoom-in is done
+
+    def plan_trajectory(self):
+        """
+        Start planning a random trajectory in the background, if not started yet.
+        Also called ahead, when the car passes the start target, so that the
+        plan is usually ready when the manipulator starts.
+        """
+        if self.planning is not None:
+            return
+        # imported on first use, only needed once the manipulator starts
+        from trajectory_planning import do_trajectory_planning
 
-        self.pointer = 0
-        self.end_memory = []
         end_point = self.workspace.green_end - self.workspace.blue_end
         end_point = np.array([end_point[0] - 0.5 * self.car.wheel_base * np.cos(-3.264),
                               end_point[1] - 0.5 * self.car.wheel_base * np.sin(-3.264),
                               -(self.car.height+self.car.wheel_radius)], dtype=np.float32)
         # print(np.sqrt(end_point[0] ** 2 + end_point[1] ** 2))
         # print(self.car.height+self.car.wheel_radius)
-        self.paths = do_trajectory_planning(end_point, self.res)
+        self.planning = self.executor.submit(do_trajectory_planning, end_point, self.res)
+
+    def init_trajectory(self):
+        """
+        Initialise the random trajectory everytime the condition satisfies.
+        The zoom-in plays while the trajectory is planned, update takes the
+        plan once it is done.
+        """
+        self.current_frame = 0
+        self.pause = False
+
+        self.pointer = 0
+        self.ready = False
+        self.plan_trajectory()
+
+        # ring buffer of the last end effector positions on the screen
+        self.trail = np.empty((self.trail_length, 2))
+        self.trail_head = 0
+        self.trail_count = 0
+
+    def _set_trajectory(self, paths):
+        """
+        Project the whole animation of a planned trajectory to the screen
+        """
+        from trajectory_planning import chain
+
+        self.paths = paths
         self.P_coordinates = self.paths[4]
         self.num_points = len(self.paths[0])
 
+        # [frames, joints, 2] positions of the base, the joints and the end effector
+        joints = chain.joint_positions(np.stack(self.paths[:4], axis=-1))
+        self.joints2d = gf.points_3d_to_2d(joints * self.zoom_factor,
+                                           offset=self.manipulator_origin2d)
+        self.joints2d = self.joints2d.reshape(joints.shape[:2] + (2,))
+        self.via_points2d = gf.points_3d_to_2d(self.P_coordinates * self.zoom_factor,
+                                               offset=self.manipulator_origin2d)
+        self.ready = True
+
     def update(self):
-        self.sur_robot.fill(self.window_settings['bg_color'])
+        self.map_changed = False
+        self.robot_changed = False
         if self.current_frame >= self.final_frames:
             # zooming-in finish, manipulator moving
-            self.pause = False
-            joints = get_path(self.paths, self.pointer, self.end_memory)
+            if not self.ready:
+                if not self.planning.done():
+                    # hold the zoomed-in map until the plan is done
+                    return
+                self._set_trajectory(self.planning.result())
+                self.planning = None
 
-            for end_pos in self.end_memory:
-                end_pos = end_pos * self.zoom_factor
-                pos2d = gf.point_3d_to_2d(*end_pos, offset=self.manipulator_origin2d)
+            self.pause = False
+            self.sur_robot.fill(self.window_settings['bg_color'])
+            self.robot_changed = True
+            joints = self.joints2d[self.pointer]
+
+            self.trail[self.trail_head] = joints[-1]
+            self.trail_head = (self.trail_head + 1) % self.trail_length
+            self.trail_count = min(self.trail_count + 1, self.trail_length)
+            for pos2d in self.trail[:self.trail_count]:
                 pygame.draw.circle(self.sur_robot, (255, 0, 0), pos2d, 3)
 
             # plot via points
-            last_via_points = self.P_coordinates[self.pointer // self.res:
-                                                 self.pointer // self.res + 2, :]
+            last_via_points = self.via_points2d[self.pointer // self.res:
+                                                self.pointer // self.res + 2]
 
-            for i, point in enumerate(last_via_points):
-                point = point * self.zoom_factor
-                pos2d = gf.point_3d_to_2d(*point, offset=self.manipulator_origin2d)
+            for i, pos2d in enumerate(last_via_points):
                 pygame.draw.circle(self.sur_robot, (100, 100, 100), pos2d, 5)
                 if (self.pointer == self.num_points - 1) and (i == 1):
                     pygame.draw.circle(self.sur_robot, (0, 0, 0), pos2d, 5)
 
-            joints = [joint * self.zoom_factor for joint in joints]
-            joints = [gf.point_3d_to_2d(*joint, offset=self.manipulator_origin2d)
-                      for joint in joints]
-
             for i in range(len(joints) - 1):
                 P1 = joints[i]
                 P2 = joints[i + 1]
@@ -187,16 +266,16 @@ class Manipulator:
             # Scale the subwindow
             scaled_width = int(self.window_settings['w'] * scale_factor)
             scaled_height = int(self.window_settings['h'] * scale_factor)
-            self.sur_map_scaled = pygame.transform.scale(
-                self.sur_map, (scaled_width, scaled_height))
+            keyframe = next(keyframe for keyframe in reversed(self.keyframes)
+                            if keyframe.get_width() >= scaled_width
+                            and keyframe.get_height() >= scaled_height)
+            self.scaled_size = (scaled_width, scaled_height)
+            pygame.transform.scale(keyframe, self.scaled_size,
+                                   self.sur_map_scaled.subsurface((0, 0), self.scaled_size))
+            self.map_changed = True
 
             self.topleft = np.array([x0 + scale_factor * (xf - x0),
                                      y0 + scale_factor * (yf - y0)], dtype=np.int32)
             self.topleft = self.topleft + self.settings.map_screen['topleft']
 
             self.current_frame += 1
-
-    def draw(self):
-        self.screen.blit(self.sur_map_scaled, self.topleft)
-        self.screen.blit(self.sur_robot, self.topleft)
-
@@ -7,6 +7,8 @@
 
 import pygame
 
+import text_cache
+
 
 class MessageBox:
     def __init__(self, settings, screen, game_stats):
@@ -14,10 +16,13 @@ class MessageBox:
         self.screen = screen
         self.game_stats = game_stats
 
-        self.font = pygame.font.SysFont(None, self.settings['font_size'])
         self.surface = pygame.Surface((self.settings['w'], self.settings['h']),
                                       pygame.SRCALPHA)
 
+        # message shown on the surface, only re-rendered when it changes
+        self.rendered_msg = None
+        self.changed = True
+
     def update(self):
         if self.game_stats.car_freeze:
             msg = 'Collision detected at: {}\n' \
@@ -26,8 +31,7 @@ class MessageBox:
             if self.game_stats.started:
                 msg = 'Driving to the end point...'
 
-                end_time = pygame.time.get_ticks()
-                timer_msg = (end_time - self.game_stats.start_time) / 1000
+                timer_msg = (self.game_stats.sim_time - self.game_stats.start_time) / 1000
                 msg = msg + '\nTime: {:.2f} s'.format(timer_msg)
             else:
                 msg = 'Driving to the start point...'
@@ -35,13 +39,24 @@ class MessageBox:
             msg = 'Watching manipulator moving...\n' \
                     '(Press Esc to stop)'
 
+        if not self.game_stats.game_active and self.game_stats.clearance is not None:
+            # developer mode: distance from the car to the red line
+            msg = msg + '\nClearance: {:.0f} px'.format(self.game_stats.clearance)
+
         if self.game_stats.best_time_score is not None:
             msg = msg + '\nBest time: {:.2f} s'.format(self.game_stats.best_time_score/1000)
+
+        self.changed = msg != self.rendered_msg
+        if not self.changed:
+            return
+        self.rendered_msg = msg
+
         self.surface.fill(self.settings['bg_color'])
 
         # Split the text into separate lines
         lines = msg.split('\n')
-        text_surfaces = [self.font.render(line, True, self.settings['text_color'])
+        text_surfaces = [text_cache.render(line, self.settings['font_size'],
+                                           self.settings['text_color'], sysfont=True)
                          for line in lines]
         text_height = text_surfaces[0].get_height()
 
@@ -50,6 +65,3 @@ class MessageBox:
             label_rect.centerx = self.surface.get_rect().center[0]
             label_rect.centery = 20 + i * text_height
             self.surface.blit(text_surface, label_rect)
-
-    def show_msg(self):
-        self.screen.blit(self.surface, self.settings['topleft'])
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# @File    : renderer.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+import pygame
+
+import text_cache
+
+
+class SurfaceSprite(pygame.sprite.DirtySprite):
+    """
+    Sprite showing a surface which is drawn elsewhere.
+    It is only marked dirty when the surface, its position or its content changes.
+    """
+    def __init__(self, layer, offset=(0, 0), clip=None):
+        """
+        :param layer: drawing order, higher on top
+        :param offset: topleft of the subscreen the positions are relative to
+        :param clip: rect of the screen the sprite is clipped to, e.g. its subscreen
+        """
+        super().__init__()
+        self._layer = layer
+        self.offset = offset
+        self.clip = clip
+        self.image = None
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.visible = 0
+
+    def show(self, image, topleft, changed=False, size=None):
+        """
+        :param changed: if the content of the image has been redrawn
+        :param size: size of the part of the image shown, the whole image by default
+        """
+        rect = pygame.Rect((topleft[0] + self.offset[0], topleft[1] + self.offset[1]),
+                           size if size is not None else image.get_size())
+        source_rect = None if size is None else pygame.Rect((0, 0), size)
+        if self.clip is not None and not self.clip.contains(rect):
+            clipped = rect.clip(self.clip)
+            if not clipped.w or not clipped.h:
+                self.hide()
+                return
+            source_rect = pygame.Rect((clipped.x - rect.x, clipped.y - rect.y), clipped.size)
+            rect = clipped
+        if changed or not self.visible or image is not self.image or rect != self.rect:
+            self.image = image
+            self.rect = rect
+            self.source_rect = source_rect
+            self.visible = 1
+            self.dirty = 1
+
+    def hide(self):
+        if self.visible:
+            self.visible = 0
+            self.dirty = 1
+
+
+class Renderer:
+    """
+    Dirty rectangle rendering of the game window.
+    The white background, the map and the axes are drawn once to a background
+    surface (containing screen1 and screen2), everything else is a sprite layered
+    on top of it. Each frame only the changed sprites, the background under them
+    and the sprites overlapping them are redrawn, and only these areas are returned
+    to be updated on the display.
+    """
+    def __init__(self, settings, screen, background, game_stats, workspace, car, large_car,
+                 control_panel, latex_window, msg_box, manipulator, zoom_buttons,
+                 restart_button, trimetric_button, axes_buttons, switch_buttons):
+        self.settings = settings
+        self.screen = screen
+        self.background = background
+        self.game_stats = game_stats
+        self.workspace = workspace
+        self.car = car
+        self.large_car = large_car
+        self.control_panel = control_panel
+        self.latex_window = latex_window
+        self.msg_box = msg_box
+        self.manipulator = manipulator
+        self.switch_buttons = switch_buttons
+
+        self.sprites = pygame.sprite.LayeredDirty()
+        self.sprites.clear(screen, background)
+        self.drawn_view = None  # map surface on the background
+
+        offset1 = settings.screen1['topleft']
+        offset2 = settings.screen2['topleft']
+        rect1 = pygame.Rect(offset1, (settings.screen1['w'], settings.screen1['h']))
+        rect2 = pygame.Rect(offset2, (settings.screen2['w'], settings.screen2['h']))
+
+        # screen 1, the car is clipped to it as when drawn on the subscreen
+        self.car_sprite = self._add_sprite(0, offset1, rect1)
+        self.msg_sprite = self._add_sprite(1, offset1)
+        self.marker_sprite = self._add_sprite(2, offset1)
+
+        # screen 2
+        self.steering_sprite = self._add_sprite(3, offset2)
+        self.zoom_map_sprite = self._add_sprite(4, offset2)
+        self._add_sprite(5, offset2).show(control_panel.frame,
+                                          settings.zoom_region['topleft'])
+        self.key_sprites = [self._add_sprite(6, offset2) for _ in range(5)]
+        self.large_car_sprite = self._add_sprite(7, offset2, rect2)
+        self.latex_sprite = self._add_sprite(8, offset2)
+        self._add_sprite(9, offset2).show(latex_window.surf_latex, (0, 0))
+        self._add_sprite(9, offset2).show(latex_window.surf_units, (0, 0))
+
+        # main screen
+        self.manipulator_map_sprite = self._add_sprite(10)
+        self.manipulator_robot_sprite = self._add_sprite(11)
+        for button in zoom_buttons + axes_buttons + [restart_button, trimetric_button]:
+            self._add_sprite(12).show(button.image, button.image_rect.topleft)
+        self.switch_sprite = self._add_sprite(12)
+        text = text_cache.render('Developer Mode', 25, (0, 0, 0))
+        text_width, text_height = text.get_size()
+        pos = switch_buttons[0].center
+        self._add_sprite(12).show(text, (pos[0] - text_width // 2,
+                                         pos[1] - text_height // 2 - 25))
+
+    def _add_sprite(self, layer, offset=(0, 0), clip=None):
+        sprite = SurfaceSprite(layer, offset, clip)
+        self.sprites.add(sprite)
+        return sprite
+
+    def draw_background(self):
+        self.background.fill(self.settings.main_screen['bg_color'])
+        self.background.fill(self.settings.screen1['bg_color'],
+                             pygame.Rect(self.settings.screen1['topleft'],
+                                         (self.settings.screen1['w'], self.settings.screen1['h'])))
+        self.background.fill(self.settings.screen2['bg_color'],
+                             pygame.Rect(self.settings.screen2['topleft'],
+                                         (self.settings.screen2['w'], self.settings.screen2['h'])))
+        self.workspace.draw()
+        self.drawn_view = self.workspace.map3d_surf
+        self.sprites.repaint_rect(self.screen.get_rect())
+
+    def update(self):
+        """
+        Update the sprites from the game objects and draw the changed areas.
+        :return: list of rects of the screen to be updated
+        """
+        if self.workspace.map3d_surf is not self.drawn_view:
+            # new view of the map
+            self.draw_background()
+
+        changed = self.car.draw_sprite()
+        self.car_sprite.show(self.car.sprite_image, self.car.sprite_rect.topleft,
+                             changed, self.car.sprite_rect.size)
+        changed = self.large_car.draw_sprite()
+        self.large_car_sprite.show(self.large_car.sprite_image, self.large_car.sprite_rect.topleft,
+                                   changed, self.large_car.sprite_rect.size)
+
+        self.msg_sprite.show(self.msg_box.surface, self.msg_box.settings['topleft'],
+                             self.msg_box.changed)
+        if self.game_stats.collision_marker is not None:
+            self.marker_sprite.show(text_cache.render('x', 38, (0, 0, 0)),
+                                    self.game_stats.collision_marker)
+        else:
+            self.marker_sprite.hide()
+
+        self.steering_sprite.show(self.control_panel.steering_wheel_sur,
+                                  self.settings.steering_wheel['topleft'],
+                                  self.control_panel.steering_changed)
+        self.zoom_map_sprite.show(self.control_panel.zoom_map_sur,
+                                  self.control_panel.zoom_map_rect.topleft,
+                                  self.control_panel.zoom_changed)
+        for sprite, (img, topleft) in zip(self.key_sprites,
+                                          self.control_panel.get_keyboard_imgs()):
+            sprite.show(img, topleft)
+        self.latex_sprite.show(self.latex_window.surf_updating, (0, 0),
+                               self.latex_window.changed)
+
+        if self.game_stats.manipulator:
+            # the map is redrawn while zooming in, the robot every frame once moving
+            self.manipulator_map_sprite.show(self.manipulator.sur_map_scaled,
+                                             self.manipulator.topleft,
+                                             self.manipulator.map_changed,
+                                             self.manipulator.scaled_size)
+            if self.manipulator.robot_changed:
+                self.manipulator_robot_sprite.show(self.manipulator.sur_robot,
+                                                   self.manipulator.topleft, True)
+            else:
+                self.manipulator_robot_sprite.hide()
+        else:
+            self.manipulator_map_sprite.hide()
+            self.manipulator_robot_sprite.hide()
+
+        switch_button = self.switch_buttons[1 if self.game_stats.game_active else 0]
+        self.switch_sprite.show(switch_button.image, switch_button.image_rect.topleft)
+
+        return self.sprites.draw(self.screen)
@@ -5,6 +5,8 @@
 # @Github  : https://github.com/sunfanyi
 # @Software: PyCharm
 
+import os
+
 import numpy as np
 
 
@@ -57,6 +59,17 @@ class Settings:
 
         'description': 'Euler',  # 'Euler' or 'Fixed' angle rotation
         # 'description': 'Fixed',
+
+        'view_cache_mb': 64,  # memory budget of the cached views (warped maps and axes)
+        'view_decimals': 6,  # R_view is rounded to this before used as cache key
+
+        # preprocessed maps (tiles, features, warps), reused across launches
+        'cache_dir': os.path.join(os.path.expanduser('~'), '.cache', 'mobile_robot'),
+        'tile_size': 256,  # side of the tiles of the map store, a multiple of 8
+        'tile_cache_mb': 32,  # memory budget of the map tiles loaded from the store
+        # largest map (decoded, in MB) whose store is built at launch, the stores of
+        # larger maps are built offline with tile_store.py
+        'store_build_mb': 128,
     }
 
     message_box = {
@@ -229,6 +242,9 @@ class Settings:
     center2global(but_zoom_reset, screen2)
 
     # ======================================== Others ======================================== #
+    # memory budget of the cached text surfaces
+    text_cache_mb = 8
+
     # Car settings
     # acceleration = 0.08
     acceleration = 0.2
@@ -239,4 +255,18 @@ class Settings:
         # 'max_speed': 20,  # m/s
         'max_speed': 50,  # m/s
         'steering_ratio': 10,  # between steering wheel and wheels
+        # slowing down, as exponential decay rates (1/s) of the factors per frame at 60 fps
+        'drag': -60 * np.log(0.99),  # speed, without acceleration
+        'turn_drag': -60 * np.log(0.95),  # speed, while steering
+        'brake_drag': -60 * np.log(0.9),  # speed, while braking
+        'steer_return': -60 * np.log(0.94),  # steering angle, while moving
+        'steer_return_idle': -60 * np.log(0.98),  # steering angle, while not moving
+    }
+
+    # Simulation clock, the car is advanced in fixed steps whatever the frame rate
+    physics = {
+        'dt': 1 / 60,  # s, fixed timestep
+        'substeps': 1,  # integration steps per timestep
+        'integrator': 'euler',  # of the car pose: 'euler', 'rk2' or 'rk4'
+        'max_frame_time': 0.25,  # s, longer frames slow the game down instead
     }
@@ -0,0 +1,714 @@
+# -*- coding: utf-8 -*-
+# @File    : simulation.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+"""
+Headless simulation of the car on the track, with NumPy only (no pygame):
+    Track       features of the map and the checks of a car against them
+    Vehicle     state, controls and step of the car, Car draws it in the game
+    Simulation  a vehicle on a track with the rules of the game mode
+    VehicleBatch, BatchSimulation   the same for N vehicles at once, held as
+                a struct of arrays (one entry per vehicle) and stepped in one call
+    SimulationClock     fixed timestep of the game loop, independent of the frame rate
+Run without a display, e.g.:
+    track = load_track(Settings.map_screen, 'assets/CWMap.jpg')
+    sim = Simulation(Settings(), track)
+    sim.reset('start')
+    sim.step(moving_fwd=True)
+"""
+
+import numpy as np
+
+from inverse_kinematics import calc_inverse, calc_inverse_batch
+from tile_store import open_tile_store
+from tools_cv import BoxMask, polygon_clearance, LOOKUP_ERROR
+from tools_geometry import SegmentGrid
+
+CONTROLS = ('moving_fwd', 'moving_bwd', 'turning_left', 'turning_right', 'brake')
+
+# time unit of the car model: the speeds, the acceleration and the steering speed
+# are per frame of the 60 fps game loop they were tuned with
+TIME_UNIT = 1 / 60  # s
+
+
+def load_track(map_settings, img_path):
+    """
+    Track of a map image, from its tiled store in the cache directory
+    """
+    tiles = open_tile_store(img_path, map_settings['cache_dir'],
+                            map_settings['tile_size'], map_settings['tile_cache_mb'],
+                            map_settings['store_build_mb'])
+    return Track(tiles)
+
+
+def runge_kutta_increment(theta, psi, V, psi_dot, l, n, integrator='rk4'):
+    """
+    Change of the pose of the Ackermann model over n time units, with constant
+    speed and steering rate:
+        x' = V cos(theta), y' = V sin(theta), theta' = V tan(psi) / l, psi' = psi_dot
+    :param integrator: 'rk2' (midpoint) or 'rk4'
+    :return: [4, ...] increments of x, y, theta, psi, for scalars or [N] arrays
+    """
+    def rates(theta, psi):
+        return np.stack(np.broadcast_arrays(V * np.cos(theta), V * np.sin(theta),
+                                            V * np.tan(psi) / l, psi_dot))
+
+    k1 = rates(theta, psi)
+    k2 = rates(theta + n / 2 * k1[2], psi + n / 2 * k1[3])
+    if integrator == 'rk2':
+        return n * k2
+    if integrator == 'rk4':
+        k3 = rates(theta + n / 2 * k2[2], psi + n / 2 * k2[3])
+        k4 = rates(theta + n * k3[2], psi + n * k3[3])
+        return n / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+    raise ValueError('Unknown integrator %s' % integrator)
+
+
+class SimulationClock:
+    """
+    Fixed timestep of the simulation: the real time of the rendered frames is
+    accumulated and consumed in steps of dt, so the car moves the same whatever
+    the frame rate, and lap times do not depend on the machine load.
+    """
+    def __init__(self, physics_settings):
+        """
+        :param physics_settings: Settings.physics
+        """
+        self.dt = physics_settings['dt']
+        self.max_frame_time = physics_settings['max_frame_time']
+        self.accumulator = 0.
+        self.skipping = False
+
+    def advance(self, frame_time):
+        """
+        :param frame_time: real time since the last call, in s
+        :return: number of steps of dt to simulate for this frame
+        """
+        if self.skipping:
+            frame_time = 0
+            self.skipping = False
+        # longer frames are slowed down rather than caught up at once
+        self.accumulator += min(frame_time, self.max_frame_time)
+        steps = int(self.accumulator // self.dt)
+        self.accumulator -= steps * self.dt
+        return steps
+
+    def skip(self):
+        """
+        Do not simulate the time until the next advance, e.g. after the game blocked
+        """
+        self.skipping = True
+
+
+class Track:
+    """
+    Features of the map, including red line, blue start line, blue end line,
+    green end line:
+        red_line: binary mask of the red line, bit-packed in tiles
+        red_clearance: distance field of the red line, in pixels (clipped to 255), in tiles
+        red_segments: outline of the red line as segments in a uniform grid
+        blue_start: xy central coordinates of the bottom right blue circle
+        blue_end: xy central coordinates of the top left blue circle
+        start_mask: binary mask of the blue start circle, packed in its bounding box
+        end_mask: binary mask of the blue end circle, packed in its bounding box
+        green_end: xy central coordinates of the green circle for the manipulator
+    """
+    # xmin, ymin, xmax, ymax of the area where the car is checked against the track
+    area = (1000, 500, 4000, 2500)
+
+    def __init__(self, tiles):
+        """
+        :param tiles: TileStore of the map
+        """
+        self.shape = tiles.shape
+
+        # Red
+        self.red_clearance = tiles.red_clearance
+        self.red_segments = SegmentGrid(tiles.red_segments)
+        self.red_line = tiles.red_line
+
+        # Blue
+        B_coords = tiles.blue_xy
+        circle1 = B_coords[B_coords[:, 0] < 2000]  # left
+        circle2 = B_coords[B_coords[:, 0] > 2000]  # right
+
+        self.blue_end = np.mean(circle1, axis=0)
+        self.blue_start = np.mean(circle2, axis=0)
+
+        self.start_mask = BoxMask.from_xy(B_coords[B_coords[:, 1] >= 2000], self.shape)
+        self.end_mask = BoxMask.from_xy(B_coords[B_coords[:, 1] < 2000], self.shape)
+
+        # Green
+        self.green_end = np.mean(tiles.green_xy, axis=0)
+
+    def in_area(self, origin):
+        """
+        :param origin: xy, or [N, 2+] xy of N cars
+        """
+        xmin, ymin, xmax, ymax = self.area
+        x, y = np.asarray(origin)[..., 0], np.asarray(origin)[..., 1]
+        return (xmin <= x) & (x <= xmax) & (ymin <= y) & (y <= ymax)
+
+    def check(self, corners):
+        """
+        Check a car footprint against the red line
+        :param corners: [4, 2] xy corners of the footprint in order
+        :return: lower bound of the clearance to the red line in pixels (0 on
+            contact), xy of the contact point with the red line or None
+        """
+        # the distance field proves most footprints clear with a few lookups,
+        # the others are tested exactly against the red line segments
+        clearance, clear = polygon_clearance(self.red_clearance, corners)
+        contact = None if clear else self.red_segments.rectangle_contact(corners)
+        if contact is not None:
+            clearance = 0.
+        return clearance, contact
+
+    def check_batch(self, corners):
+        """
+        Check N car footprints against the red line
+        :param corners: [N, 4, 2] xy corners of the footprints in order
+        :return: [N] lower bounds of the clearances to the red line in pixels,
+            see check, [N, 2] xy of the contact points with the red line (nan if none)
+        """
+        clearance = np.empty(len(corners))
+        contact = np.full((len(corners), 2), np.nan)
+
+        # the free circles at the centers prove most footprints clear at once,
+        # same as the first test of polygon_clearance
+        h, w = self.red_clearance.shape
+        center = np.mean(corners, axis=1)
+        radius = np.max(np.linalg.norm(corners - center[:, None], axis=2), axis=1)
+        xs = np.clip(np.round(center[:, 0]).astype(np.int32), 0, w - 1)
+        ys = np.clip(np.round(center[:, 1]).astype(np.int32), 0, h - 1)
+        d_center = self.red_clearance[ys, xs].astype(np.float32)
+        clear = d_center > radius + 1
+        clearance[clear] = d_center[clear] - radius[clear] - LOOKUP_ERROR
+
+        # the footprints close to the red line are checked one by one
+        for i in np.flatnonzero(~clear):
+            clearance[i], point = self.check(corners[i])
+            if point is not None:
+                contact[i] = point
+        return clearance, contact
+
+    def at_start(self, origin):
+        """
+        :param origin: xy, or [N, 2+] xy of N cars
+        """
+        origin = np.asarray(origin)
+        return self.start_mask[origin[..., 1].astype(np.int64), origin[..., 0].astype(np.int64)]
+
+    def at_end(self, origin):
+        """
+        :param origin: xy, or [N, 2+] xy of N cars
+        """
+        origin = np.asarray(origin)
+        return self.end_mask[origin[..., 1].astype(np.int64), origin[..., 0].astype(np.int64)]
+
+
+class Vehicle:
+    """
+    Kinematic state of the car, advanced in steps of time from the controls.
+    Be careful with the coordinate system that Y-axis is flipped for visualisation,
+    so turning_left actually turns right on the screen.
+    """
+    def __init__(self, car_settings, map_settings, track, scale=39):
+        """
+        :param car_settings: Settings.car
+        :param map_settings: Settings.map_screen, for the limits of the map
+        :param track: Track (or Workspace) giving the start and end positions
+        :param scale: pixels per metre
+        """
+        self.car_settings = car_settings
+        self.map_settings = map_settings
+        self.track = track
+        self.scale = scale
+
+        self.reset_dimensions()
+        self.reset_motion()
+        self.reset_positions()
+
+    def reset_dimensions(self):
+        self.length = 3.3 * self.scale
+        self.width = 2. * self.scale
+        self.height = 1.5 * self.scale
+        self.wheel_radius = 0.57 * self.scale
+        self.wheel_width = 0.48 * self.scale
+        self.wheel_offset = 0.2 * self.scale
+        self.wheel_base = 1.9 * self.scale
+
+    def reset_motion(self):
+        # Car control
+        self.moving_fwd = False
+        self.moving_bwd = False
+        self.turning_left = False
+        self.turning_right = False
+        self.brake = False
+
+        # Kinematics properties (update in inverse kinematics)
+        self.steering_angle = 0   # psi, in radians
+        # non-zero initial V, otherwise ICR = nan at the beginning
+        # beta will be zero even with steering when game starts until assign a speed
+        self.car_speed = 1e-10  # in m/s, avoid divided by zero
+        self.P_i_dot = np.float32([0, 0, 0, 0])  # X dot, Y dot, theta dot, psi dot
+        self.wheels_orientation = np.float32([0, 0, 0, 0])  # in radians, 4 wheels
+        self.wheels_speed = np.float32([0, 0, 0, 0])  # in rad/s, 4 wheels
+        self.ICR = np.nan  # instantaneous center of rotation
+
+    def reset_positions(self, location='IC_logo'):
+        # State properties
+        if location == 'IC_logo':
+            self.car_origin3d = np.float32([2900, 2310, self.wheel_radius])
+            self.car_orientation = -1.575  # theta, in radians
+        elif location == 'start':
+            self.car_origin3d = np.float32([self.track.blue_start[0],
+                                            self.track.blue_start[1],
+                                            self.wheel_radius])
+            self.car_orientation = -1.7  # theta, in radians
+        elif location == 'end':
+            self.car_origin3d = np.float32([self.track.blue_end[0],
+                                            self.track.blue_end[1],
+                                            self.wheel_radius])
+            self.car_orientation = -3.264  # theta, in radians
+        elif location == 'origin':
+            self.car_origin3d = np.float32([0, 0, self.wheel_radius])
+            self.car_orientation = 0  # theta, in radians
+        else:
+            raise ValueError('Invalid location')
+
+        self.last_car_origin3d = self.car_origin3d.copy()
+        self.last_orientation = self.car_orientation
+        self.steering_rate = 0  # in rad/s
+
+    def set_controls(self, **controls):
+        """
+        :param controls: moving_fwd, moving_bwd, turning_left, turning_right, brake
+        """
+        for name, value in controls.items():
+            if name not in CONTROLS:
+                raise ValueError('Unknown control %s' % name)
+            setattr(self, name, bool(value))
+
+    def footprint(self):
+        """
+        :return: [4, 2] xy corners of the car footprint: FL, FR, RR, RL
+        """
+        x = np.array([1, 1, -1, -1]) * self.length / 2
+        y = np.array([1, -1, -1, 1]) * self.width / 2
+        c = np.cos(self.car_orientation)
+        s = np.sin(self.car_orientation)
+        return np.column_stack([c * x - s * y + self.car_origin3d[0],
+                                s * x + c * y + self.car_origin3d[1]])
+
+    def step_back(self):
+        self.car_origin3d = self.last_car_origin3d.copy()
+        self.car_orientation = self.last_orientation
+
+    def step(self, dt=TIME_UNIT, bounded=True, substeps=1, integrator='euler'):
+        """
+        Advance the car by dt from the controls
+        :param dt: in s
+        :param bounded: step back if the car leaves the map
+        :param substeps: number of integration steps over dt
+        :param integrator: of the pose, 'euler', 'rk2' or 'rk4'
+        """
+        h = dt / substeps
+        for _ in range(substeps):
+            self.substep(h, integrator)
+
+            # one step back if car out of the map:
+            if bounded:
+                if (self.car_origin3d[0] > self.map_settings['xlim'] + 20) or \
+                        (self.car_origin3d[0] < -20) or \
+                        (self.car_origin3d[1] > self.map_settings['ylim'] + 20) or \
+                        (self.car_origin3d[1] < -20):
+                    self.step_back()
+
+    def substep(self, h, integrator='euler'):
+        """
+        :param h: in s
+        """
+        n = h / TIME_UNIT
+        moving = True if (self.moving_fwd or self.moving_bwd) else False
+        turning = True if (self.turning_left or self.turning_right) else False
+
+        max_speed = self.car_settings['max_speed']
+
+        acc = self.car_settings['acc']
+        acc *= 1 if self.moving_fwd else -1
+
+        psi_dot = self.car_settings['steering_speed']
+        psi_dot *= 1 if self.turning_left else -1
+
+        if moving:
+            if np.abs(self.car_speed) < max_speed:
+                self.car_speed += acc * n
+        else:  # slow down
+            self.car_speed *= np.exp(-self.car_settings['drag'] * h)
+
+        if turning:
+            self.car_speed *= np.exp(-self.car_settings['turn_drag'] * h)  # slow down
+            if np.abs(self.steering_angle) < self.car_settings['max_steer']:
+                self.steering_rate = psi_dot
+            else:
+                self.steering_rate = 0
+        else:
+            self.steering_rate = 0
+            # steering wheel returns to initial position
+            steer_return = self.car_settings['steer_return' if moving else 'steer_return_idle']
+            self.steering_angle *= np.exp(-steer_return * h)
+
+        if self.brake:
+            self.car_speed *= np.exp(-self.car_settings['brake_drag'] * h)
+
+        # after getting inputs (speed, steering rate), feed to inverse kinematics
+        calc_inverse(self)
+
+        if np.any(np.abs(self.car_origin3d - self.last_car_origin3d) >= 1):
+            self.last_car_origin3d = self.car_origin3d.copy()
+            self.last_orientation = self.car_orientation
+
+        if integrator == 'euler':
+            increment = self.P_i_dot * n
+        else:
+            increment = runge_kutta_increment(self.car_orientation, self.steering_angle,
+                                              self.car_speed, self.steering_rate,
+                                              self.wheel_base, n, integrator)
+        self.car_origin3d[0] += increment[0]  # x
+        self.car_origin3d[1] += increment[1]  # y
+        self.car_orientation += increment[2]  # theta
+        self.steering_angle += increment[3]  # phi
+
+
+class Simulation:
+    """
+    A vehicle on a track with the rules of the game mode: the car freezes when
+    it hits the red line, the lap is timed from the start target to the end target.
+    Times are counted in steps of Settings.physics['dt'].
+    """
+    def __init__(self, settings, track, scale=39):
+        self.track = track
+        self.physics = settings.physics
+        self.vehicle = Vehicle(settings.car, settings.map_screen, track, scale)
+        self.reset()
+
+    def reset(self, location='IC_logo'):
+        self.vehicle.reset_motion()
+        self.vehicle.reset_positions(location)
+
+        self.frozen = False  # after a collision, until moving or braking
+        self.started = False  # after touching the start target
+        self.finished = False  # after touching the end target
+        self.clearance = None  # distance between the car and the red line, in pixels
+        self.collision_point = None  # xy of the last contact with the red line
+
+        self.steps = 0
+        self.start_step = 0
+        self.lap_steps = None  # steps from the start target to the end target
+
+    @property
+    def lap_time(self):
+        """
+        Time from the start target to the end target, in s, None until finished
+        """
+        return None if self.lap_steps is None else self.lap_steps * self.physics['dt']
+
+    def step(self, **controls):
+        """
+        Set the controls (see Vehicle.set_controls) and advance by one step
+        """
+        vehicle = self.vehicle
+        vehicle.set_controls(**controls)
+        if self.frozen and (vehicle.moving_fwd or vehicle.moving_bwd or vehicle.brake):
+            # same as pressing the keys in the game
+            vehicle.step_back()
+            self.frozen = False
+        if not self.frozen:
+            vehicle.step(self.physics['dt'], True, self.physics['substeps'],
+                         self.physics['integrator'])
+        self.steps += 1
+        self.check()
+
+    def check(self):
+        """
+        Check the car against the track, see game_function.detect_collision
+        """
+        vehicle = self.vehicle
+        if not self.track.in_area(vehicle.car_origin3d):
+            self.clearance = None
+            return
+
+        self.clearance, contact = self.track.check(vehicle.footprint())
+        if contact is not None:
+            self.collision_point = contact
+            self.frozen = True
+            vehicle.reset_motion()
+
+        if not self.started:
+            if self.track.at_start(vehicle.car_origin3d):
+                vehicle.reset_positions('start')
+                vehicle.reset_motion()
+                self.started = True
+                self.start_step = self.steps
+        elif self.track.at_end(vehicle.car_origin3d):
+            vehicle.reset_positions('end')
+            vehicle.reset_motion()
+            self.started = False
+            self.finished = True
+            self.lap_steps = self.steps - self.start_step
+
+
+class VehicleBatch:
+    """
+    N vehicles as a struct of arrays, stepped together with the same model as
+    Vehicle. The attributes have the names of the Vehicle ones with one entry
+    per vehicle, e.g. car_origin3d is [N, 3] and car_speed is [N].
+    All vehicles have the same dimensions.
+    """
+    def __init__(self, car_settings, map_settings, track, n, scale=39):
+        """
+        :param n: number of vehicles
+        """
+        self.car_settings = car_settings
+        self.map_settings = map_settings
+        self.track = track
+        self.n = n
+        self.scale = scale
+
+        Vehicle.reset_dimensions(self)
+
+        # Car control
+        for name in CONTROLS:
+            setattr(self, name, np.zeros(n, dtype=bool))
+
+        # Kinematics properties
+        self.steering_angle = np.zeros(n)
+        self.car_speed = np.zeros(n)
+        self.P_i_dot = np.zeros((n, 4))
+        self.wheels_orientation = np.zeros((n, 4), dtype=np.float32)
+        self.wheels_speed = np.zeros((n, 4), dtype=np.float32)
+        self.ICR = np.zeros(n)
+
+        # State properties
+        self.car_origin3d = np.zeros((n, 3), dtype=np.float32)
+        self.car_orientation = np.zeros(n)
+        self.last_car_origin3d = np.zeros((n, 3), dtype=np.float32)
+        self.last_orientation = np.zeros(n)
+        self.steering_rate = np.zeros(n)
+
+        self.reset_motion()
+        self.reset_positions()
+
+    def _mask(self, mask):
+        return np.ones(self.n, dtype=bool) if mask is None else np.asarray(mask)
+
+    def reset_motion(self, mask=None):
+        """
+        :param mask: [N] boolean, the vehicles to reset, all if None
+        """
+        mask = self._mask(mask)
+        for name in CONTROLS:
+            getattr(self, name)[mask] = False
+        self.steering_angle[mask] = 0
+        self.car_speed[mask] = 1e-10  # avoid divided by zero, see Vehicle
+        self.P_i_dot[mask] = 0
+        self.wheels_orientation[mask] = 0
+        self.wheels_speed[mask] = 0
+        self.ICR[mask] = np.nan
+
+    def reset_positions(self, location='IC_logo', mask=None):
+        """
+        :param location: see Vehicle.reset_positions
+        :param mask: [N] boolean, the vehicles to reset, all if None
+        """
+        mask = self._mask(mask)
+        positions = {'IC_logo': ([2900, 2310], -1.575),
+                     'start': (self.track.blue_start, -1.7),
+                     'end': (self.track.blue_end, -3.264),
+                     'origin': ([0, 0], 0)}
+        if location not in positions:
+            raise ValueError('Invalid location')
+        xy, orientation = positions[location]
+
+        self.car_origin3d[mask] = np.float32([xy[0], xy[1], self.wheel_radius])
+        self.car_orientation[mask] = orientation
+        self.last_car_origin3d[mask] = self.car_origin3d[mask]
+        self.last_orientation[mask] = orientation
+        self.steering_rate[mask] = 0
+
+    def set_controls(self, **controls):
+        """
+        :param controls: moving_fwd, moving_bwd, turning_left, turning_right, brake,
+            each a boolean or [N] booleans
+        """
+        for name, value in controls.items():
+            if name not in CONTROLS:
+                raise ValueError('Unknown control %s' % name)
+            getattr(self, name)[:] = value
+
+    def footprint(self):
+        """
+        :return: [N, 4, 2] xy corners of the car footprints: FL, FR, RR, RL
+        """
+        x = np.array([1, 1, -1, -1]) * self.length / 2
+        y = np.array([1, -1, -1, 1]) * self.width / 2
+        c = np.cos(self.car_orientation)[:, None]
+        s = np.sin(self.car_orientation)[:, None]
+        return np.stack([c * x - s * y + self.car_origin3d[:, :1],
+                         s * x + c * y + self.car_origin3d[:, 1:2]], axis=-1)
+
+    def step_back(self, mask=None):
+        mask = self._mask(mask)
+        self.car_origin3d[mask] = self.last_car_origin3d[mask]
+        self.car_orientation[mask] = self.last_orientation[mask]
+
+    def step(self, dt=TIME_UNIT, active=None, bounded=True, substeps=1, integrator='euler'):
+        """
+        Advance the vehicles by dt from the controls, see Vehicle.step
+        :param active: [N] boolean, the vehicles to step, all if None
+        :param bounded: step back the vehicles which leave the map
+        """
+        active = self._mask(active)
+        h = dt / substeps
+        for _ in range(substeps):
+            self.substep(h, active, integrator)
+
+            # one step back if car out of the map:
+            if bounded:
+                x, y = self.car_origin3d[:, 0], self.car_origin3d[:, 1]
+                out = (x > self.map_settings['xlim'] + 20) | (x < -20) | \
+                    (y > self.map_settings['ylim'] + 20) | (y < -20)
+                self.step_back(active & out)
+
+    def substep(self, h, active, integrator='euler'):
+        """
+        :param h: in s
+        :param active: [N] boolean, the vehicles to step
+        """
+        n = h / TIME_UNIT
+        moving = self.moving_fwd | self.moving_bwd
+        turning = self.turning_left | self.turning_right
+
+        acc = np.where(self.moving_fwd, 1, -1) * self.car_settings['acc']
+        psi_dot = np.where(self.turning_left, 1, -1) * self.car_settings['steering_speed']
+        damping = {name: np.exp(-self.car_settings[name] * h)
+                   for name in ('drag', 'turn_drag', 'brake_drag',
+                                'steer_return', 'steer_return_idle')}
+
+        speed = self.car_speed
+        speed = np.where(moving,
+                         np.where(np.abs(speed) < self.car_settings['max_speed'],
+                                  speed + acc * n, speed),
+                         speed * damping['drag'])  # slow down
+        speed = np.where(turning, speed * damping['turn_drag'], speed)
+        speed = np.where(self.brake, speed * damping['brake_drag'], speed)
+        steerable = np.abs(self.steering_angle) < self.car_settings['max_steer']
+        steering_rate = np.where(turning & steerable, psi_dot, 0.)
+        # steering wheel returns to initial position
+        steer_return = np.where(moving, damping['steer_return'], damping['steer_return_idle'])
+        steering_angle = np.where(turning, self.steering_angle,
+                                  self.steering_angle * steer_return)
+
+        self.car_speed = np.where(active, speed, self.car_speed)
+        self.steering_rate = np.where(active, steering_rate, self.steering_rate)
+        self.steering_angle = np.where(active, steering_angle, self.steering_angle)
+
+        # after getting inputs (speed, steering rate), feed to inverse kinematics,
+        # the frozen vehicles keep their kinematics
+        kept = (self.P_i_dot.copy(), self.wheels_orientation.copy(),
+                self.wheels_speed.copy(), self.ICR.copy())
+        calc_inverse_batch(self)
+        for new, old in zip((self.P_i_dot, self.wheels_orientation, self.wheels_speed, self.ICR),
+                            kept):
+            new[~active] = old[~active]
+
+        moved = active & np.any(np.abs(self.car_origin3d - self.last_car_origin3d) >= 1, axis=1)
+        self.last_car_origin3d[moved] = self.car_origin3d[moved]
+        self.last_orientation[moved] = self.car_orientation[moved]
+
+        if integrator == 'euler':
+            increment = self.P_i_dot * n
+        else:
+            increment = runge_kutta_increment(self.car_orientation, self.steering_angle,
+                                              self.car_speed, self.steering_rate,
+                                              self.wheel_base, n, integrator).T
+        increment[~active] = 0
+        self.car_origin3d[:, :2] += increment[:, :2]  # x, y
+        self.car_orientation += increment[:, 2]  # theta
+        self.steering_angle += increment[:, 3]  # phi
+
+
+class BatchSimulation:
+    """
+    N vehicles on a track with the rules of the game mode, see Simulation.
+    The vehicles do not interact, each has its own lap.
+    """
+    def __init__(self, settings, track, n, scale=39):
+        self.track = track
+        self.physics = settings.physics
+        self.vehicles = VehicleBatch(settings.car, settings.map_screen, track, n, scale)
+        self.n = n
+        self.reset()
+
+    def reset(self, location='IC_logo'):
+        self.vehicles.reset_motion()
+        self.vehicles.reset_positions(location)
+
+        self.frozen = np.zeros(self.n, dtype=bool)
+        self.started = np.zeros(self.n, dtype=bool)
+        self.finished = np.zeros(self.n, dtype=bool)
+        self.clearance = np.full(self.n, np.nan)  # nan outside the checked area
+        self.collision_point = np.full((self.n, 2), np.nan)
+
+        self.steps = 0
+        self.start_step = np.zeros(self.n, dtype=np.int64)
+        self.lap_steps = np.full(self.n, -1, dtype=np.int64)  # -1 until finished
+
+    def step(self, **controls):
+        """
+        Set the controls (see VehicleBatch.set_controls) and advance by one step
+        """
+        vehicles = self.vehicles
+        vehicles.set_controls(**controls)
+        # same as pressing the keys in the game
+        unfreeze = self.frozen & (vehicles.moving_fwd | vehicles.moving_bwd | vehicles.brake)
+        vehicles.step_back(unfreeze)
+        self.frozen &= ~unfreeze
+
+        vehicles.step(self.physics['dt'], ~self.frozen, True, self.physics['substeps'],
+                      self.physics['integrator'])
+        self.steps += 1
+        self.check()
+
+    def check(self):
+        """
+        Check the vehicles against the track, see Simulation.check
+        """
+        vehicles = self.vehicles
+        inside = self.track.in_area(vehicles.car_origin3d)
+        self.clearance[:] = np.nan
+        if not np.any(inside):
+            return
+
+        index = np.flatnonzero(inside)
+        clearance, contact = self.track.check_batch(vehicles.footprint()[index])
+        self.clearance[index] = clearance
+        hit = index[~np.isnan(contact[:, 0])]
+        self.collision_point[hit] = contact[~np.isnan(contact[:, 0])]
+        self.frozen[hit] = True
+        vehicles.reset_motion(np.isin(np.arange(self.n), hit))
+
+        origin = vehicles.car_origin3d
+        start = inside & ~self.started & self.track.at_start(origin)
+        end = inside & self.started & self.track.at_end(origin)
+        for location, reached in [('start', start), ('end', end)]:
+            vehicles.reset_positions(location, reached)
+            vehicles.reset_motion(reached)
+        self.started = (self.started | start) & ~end
+        self.finished |= end
+        self.start_step[start] = self.steps
+        self.lap_steps[end] = self.steps - self.start_step[end]
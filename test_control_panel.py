@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# @File    : test_control_panel.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+from control_panel import ControlPanel
+from settings import Settings
+from tile_store import build_tile_store, TileStore
+
+
+def test_zoom_out_reads_into_buffer(tmp_path):
+    pygame.init()
+    img = np.full((1000, 1500, 3), 255, dtype=np.uint8)
+    img[400:420] = (255, 0, 0)
+    build_tile_store(img, str(tmp_path), tile_size=64)
+    tiles = TileStore(str(tmp_path))
+
+    settings = Settings()
+    settings.zoom_region = dict(Settings.zoom_region, **{'3d': False, 'car_fixed': True})
+    workspace = SimpleNamespace(pyramid=tiles.levels)
+    car = SimpleNamespace(car_origin3d=np.float32([700, 410, 20]), car_orientation=0.3)
+    panel = ControlPanel(settings, pygame.Surface((1300, 600)), None, workspace, car)
+
+    regions = []
+    for level in tiles.levels:
+        read_region = level.read_region
+
+        def _read_region(top, left, h, w, fill=255, out=None, read_region=read_region):
+            regions.append((h, w, out is not None))
+            return read_region(top, left, h, w, fill, out)
+        level.read_region = _read_region
+
+    panel.update_zoomed_map()
+    assert panel.zoom_buffer.min() < 255  # the red line is shown
+
+    # zoomed out until the map is less than a window pixel
+    buffer_size = len(panel.zoom_region_buffer)
+    for clicks in range(10, 200, 10):
+        settings.zoom_region['factor'] = Settings.initial_zoom_in_factor / 1.1 ** clicks
+        panel.update_zoomed_map()
+
+    assert len(regions) == 20
+    for h, w, buffered in regions:
+        assert buffered and h <= buffer_size and w <= buffer_size
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# @File    : test_trajectory_planning.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+import numpy as np
+
+import trajectory_planning as tp
+
+
+def test_random_trans_mat_single():
+    np.random.seed(0)
+    T = tp.get_random_trans_mat()
+    assert T.shape == (4, 4)
+    np.testing.assert_allclose(T[3], [0, 0, 0, 1])
+
+
+def test_random_trans_mat_stack():
+    np.random.seed(0)
+    assert tp.get_random_trans_mat(3).shape == (3, 4, 4)
+
+
+def test_random_via_points_reachable():
+    np.random.seed(0)
+    via_points, P_coordinates = tp.get_random_via_points(None)
+    assert via_points.shape == (4, tp.num_via_points + 2)
+    T = tp.fwd_kinematics(via_points[1], via_points[2], via_points[3], via_points[0])
+    np.testing.assert_allclose(T[:, :3, 3], P_coordinates, atol=1e-2)
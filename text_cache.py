@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# @File    : text_cache.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+import pygame
+
+from settings import Settings
+from tools_cache import LRUCache
+
+# font objects, created once for each (name, size, sysfont)
+_fonts = {}
+
+# rendered text surfaces, least recently used ones dropped first
+_surfaces = LRUCache(Settings.text_cache_mb * 2 ** 20)
+
+
+def get_font(size, name=None, sysfont=False):
+    """
+    Shared font object
+    :param size: font size
+    :param name: font file (or system font name if sysfont), None for the default font
+    :param sysfont: load with pygame.font.SysFont instead of pygame.font.Font
+    """
+    key = (name, size, sysfont)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(name, size) if sysfont else pygame.font.Font(name, size)
+        _fonts[key] = font
+    return font
+
+
+def render(text, size, color, background=None, name=None, sysfont=False):
+    """
+    Rendered text surface, shared between all callers so it must not be drawn on.
+    The font arguments are the same as get_font.
+    """
+    key = (text, size, color, background, name, sysfont)
+    surface = _surfaces.get(key)
+    if surface is None:
+        font = get_font(size, name, sysfont)
+        surface = font.render(text, True, color, background)
+        nbytes = surface.get_bytesize() * surface.get_width() * surface.get_height()
+        _surfaces.put(key, surface, nbytes)
+    return surface
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+# @File    : tile_store.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+"""
+On-disk tiled store of a track map, so that maps of any size run in bounded memory.
+
+Layout of a store directory:
+    meta.json               shapes, tile size and the number of levels
+    level{i}.npy            map pyramid level i, RGB, [rows, cols, T, T, 3] tiles
+    red_clearance.npy       distance field of the red line, [rows, cols, T, T]
+    red_bits.npy            red line mask, bit-packed along x, [rows, cols, T, T / 8]
+    red_segments.npy        outline of the red line, [N, 2, 2]
+    blue_xy.npy, green_xy.npy   xy coordinates of the blue and green pixels
+
+The store is built band by band (a few rows of tiles at a time), and read through
+np.memmap: point lookups touch single pages, regions are assembled from tiles kept
+in an LRU cache.
+
+Stores are kept in a cache directory, keyed by the content of the image, the
+settings of the store and STORE_VERSION (bump it when the format or the feature
+extraction changes), see open_tile_store. Only the stores of the same image made
+by an older STORE_VERSION are removed automatically, other stale stores are left
+for the user to delete.
+
+The build decodes the whole image at once, so the game only builds missing stores
+of maps up to a size (Settings.map_screen['store_build_mb']). Stores of larger maps
+are built offline, once, with:
+    python tile_store.py <map image> <cache directory> [--tile-size 256]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import struct
+
+import cv2
+import numpy as np
+
+from tools_cache import LRUCache, file_digest, values_digest
+from tools_cv import extract_color, mask2xy, distance_field
+from tools_geometry import extract_segments
+
+STORE_VERSION = 1
+
+
+def _num_tiles(shape, tile_size):
+    return -(-shape[0] // tile_size), -(-shape[1] // tile_size)
+
+
+def _write_band(tiles, ty, band):
+    """
+    Write a band of rows (up to a tile high) into row ty of a tile-major array
+    """
+    h, w = band.shape[:2]
+    rows, cols = tiles.shape[2:4]
+    padded = np.zeros((rows, tiles.shape[1] * cols) + band.shape[2:], dtype=tiles.dtype)
+    padded[:h, :w] = band
+    tiles[ty] = padded.reshape((rows, tiles.shape[1], cols) + band.shape[2:]).swapaxes(0, 1)
+
+
+def _open_tiles(path, shape, tile_size, dtype, channels=()):
+    return np.lib.format.open_memmap(
+        path, mode='w+', dtype=dtype,
+        shape=_num_tiles(shape, tile_size) + (tile_size, tile_size) + channels)
+
+
+def build_tile_store(img, store_dir, tile_size=256, source=None):
+    """
+    :param img: [h, w, 3] RGB map, or the path of the map image
+    :param store_dir: directory to write the store to
+    :param tile_size: tile side in pixels, a multiple of 8
+    :param source: absolute path of the map image, recorded in the meta data
+    """
+    if isinstance(img, str):
+        img = cv2.cvtColor(cv2.imread(img), cv2.COLOR_BGR2RGB)
+    os.makedirs(store_dir, exist_ok=True)
+    T = tile_size
+    h, w = img.shape[:2]
+
+    # features: the distance field needs the mask up to its clipping distance
+    # around each band, the morphological opening only a few pixels
+    margin = 256
+    clearance = _open_tiles(os.path.join(store_dir, 'red_clearance.npy'), (h, w), T, np.uint8)
+    red_bits = np.lib.format.open_memmap(
+        os.path.join(store_dir, 'red_bits.npy'), mode='w+', dtype=np.uint8,
+        shape=_num_tiles((h, w), T) + (T, T // 8))
+    band_size = 4 * T  # rows of the bands, several tiles to amortise the margins
+    segments, blue_xy, green_xy = [], [], []
+    for y0 in range(0, h, band_size):
+        y1 = min(y0 + band_size, h)
+        top = max(y0 - margin, 0)
+        band = img[top:min(y1 + margin, h)]
+        _, mask_R = extract_color(band, 'R')
+        _, mask_G = extract_color(band, 'G')
+        _, mask_B = extract_color(band, 'B')
+        core = slice(y0 - top, y1 - top)
+
+        field = distance_field(mask_R)[core]
+        bits = np.packbits(mask_R[core], axis=1)
+        for ty in range(y0 // T, -(-y1 // T)):
+            rows = slice(ty * T - y0, (ty + 1) * T - y0)
+            _write_band(clearance, ty, field[rows])
+            _write_band(red_bits, ty, bits[rows])
+        # the cuts of the band add segments inside the red line only
+        band_segments = extract_segments(mask_R[core])
+        band_segments[:, :, 1] += y0
+        segments.append(band_segments)
+        for coords, mask in [(blue_xy, mask_B), (green_xy, mask_G)]:
+            xy = mask2xy(mask[core])
+            xy[:, 1] += y0
+            coords.append(xy)
+    clearance.flush()
+    red_bits.flush()
+    np.save(os.path.join(store_dir, 'red_segments.npy'), np.concatenate(segments))
+    np.save(os.path.join(store_dir, 'blue_xy.npy'), np.concatenate(blue_xy))
+    np.save(os.path.join(store_dir, 'green_xy.npy'), np.concatenate(green_xy))
+
+    # map pyramid, each level from bands of the previous one, down to a single tile
+    level_shapes = [(h, w)]
+    tiles = _open_tiles(os.path.join(store_dir, 'level0.npy'), (h, w), T, np.uint8, (3,))
+    for ty in range(tiles.shape[0]):
+        _write_band(tiles, ty, img[ty * T:(ty + 1) * T])
+    tiles.flush()
+    while max(level_shapes[-1]) > T:
+        src = TiledImage(tiles, level_shapes[-1] + (3,))
+        shape = ((level_shapes[-1][0] + 1) // 2, (level_shapes[-1][1] + 1) // 2)
+        tiles = _open_tiles(os.path.join(store_dir, 'level%d.npy' % len(level_shapes)),
+                            shape, T, np.uint8, (3,))
+        for ty in range(tiles.shape[0]):
+            # even start and a few rows of margin give the same result as a
+            # pyrDown of the whole level
+            top = max(2 * ty * T - 4, 0)
+            band = cv2.pyrDown(src[top:2 * (ty + 1) * T + 4, :])
+            first = ty * T - top // 2
+            _write_band(tiles, ty, band[first:first + min(T, shape[0] - ty * T)])
+        tiles.flush()
+        level_shapes.append(shape)
+
+    # written last, so an interrupted build is not taken as a store
+    with open(os.path.join(store_dir, 'meta.json'), 'w') as f:
+        json.dump({'version': STORE_VERSION, 'source': source, 'tile_size': T,
+                   'level_shapes': level_shapes}, f)
+
+
+def is_tile_store(store_dir):
+    return os.path.isfile(os.path.join(store_dir, 'meta.json'))
+
+
+def _is_outdated_store(store_dir, source):
+    """
+    If the store was built from the source image by an older STORE_VERSION
+    """
+    try:
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get('source') == source and meta.get('version', STORE_VERSION) < STORE_VERSION
+
+
+def image_shape(path):
+    """
+    Shape of a PNG or JPEG image read from its header, without decoding it
+    :return: (h, w), None for other formats
+    """
+    with open(path, 'rb') as f:
+        head = f.read(24)
+        if head[:8] == b'\x89PNG\r\n\x1a\n':
+            w, h = struct.unpack('>II', head[16:24])
+            return h, w
+        if head[:2] != b'\xff\xd8':
+            return None
+        # JPEG: segments up to the start of frame, which has the size
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xff:
+                return None
+            if 0xc0 <= marker[1] <= 0xcf and marker[1] not in (0xc4, 0xc8, 0xcc):
+                h, w = struct.unpack('>xxxHH', f.read(7))
+                return h, w
+            length, = struct.unpack('>H', f.read(2))
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def open_tile_store(img_path, cache_dir, tile_size=256, cache_mb=32, build_mb=None):
+    """
+    Store of a map image in the cache directory, built if not cached yet.
+    Stores of the same image built by older versions are removed.
+    :param build_mb: largest decoded image (RGB, in MB) whose store is built here,
+        None for any size. Stores of larger images have to be built offline.
+    """
+    source = os.path.abspath(img_path)
+    name = os.path.splitext(os.path.basename(img_path))[0]
+    key = values_digest(file_digest(img_path), tile_size, STORE_VERSION)[:16]
+    store_dir = os.path.join(cache_dir, '%s-%s' % (name, key))
+
+    if not is_tile_store(store_dir):
+        if build_mb is not None:
+            shape = image_shape(img_path)
+            if shape is None or shape[0] * shape[1] * 3 > build_mb * 2 ** 20:
+                raise FileNotFoundError(
+                    'No tile store of %s in %s. Maps over %g MB (or not PNG or JPEG) '
+                    'are built offline, with:\n    python tile_store.py %s %s --tile-size %d'
+                    % (img_path, cache_dir, build_mb, img_path, cache_dir, tile_size))
+
+        # built aside then moved in, so an interrupted build is never used
+        tmp_dir = '%s.%d.tmp' % (store_dir, os.getpid())
+        build_tile_store(img_path, tmp_dir, tile_size, source)
+        if is_tile_store(store_dir):  # built by another instance meanwhile
+            shutil.rmtree(tmp_dir)
+        else:
+            shutil.rmtree(store_dir, ignore_errors=True)
+            os.replace(tmp_dir, store_dir)
+
+        # only <name>-<key> stores, not the ones of other maps sharing the prefix
+        pattern = re.compile(re.escape(name) + '-[0-9a-f]{16}')
+        for entry in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, entry)
+            if pattern.fullmatch(entry) and path != store_dir \
+                    and _is_outdated_store(path, source):
+                shutil.rmtree(path, ignore_errors=True)
+
+    return TileStore(store_dir, cache_mb)
+
+
+class TiledImage:
+    """
+    Image stored as tiles, looked up like an array:
+        image[rows, cols] with integer arrays, read through the memory map
+        image[y0:y1, x0:x1] assembles the region from cached tiles
+    """
+    def __init__(self, tiles, shape, cache=None):
+        """
+        :param tiles: [rows, cols, T, T, ...] tile-major array, usually memory-mapped
+        :param shape: shape of the image
+        :param cache: LRUCache shared by the tiled images, None to read tiles directly
+        """
+        self.tiles = tiles
+        self.shape = tuple(shape)
+        self.tile_size = tiles.shape[2]
+        self.cache = cache
+
+    def __getitem__(self, index):
+        rows, cols = index
+        if isinstance(rows, slice):
+            top, bottom, _ = rows.indices(self.shape[0])
+            left, right, _ = cols.indices(self.shape[1])
+            return self.read_region(top, left, max(bottom - top, 0), max(right - left, 0))
+        rows = np.asarray(rows)
+        cols = np.asarray(cols)
+        T = self.tile_size
+        return self.tiles[rows // T, cols // T, rows % T, cols % T]
+
+    def tile(self, ty, tx):
+        if self.cache is None:
+            return self.tiles[ty, tx]
+        key = (id(self), ty, tx)
+        tile = self.cache.get(key)
+        if tile is None:
+            tile = np.array(self.tiles[ty, tx])
+            self.cache.put(key, tile, tile.nbytes)
+        return tile
+
+    def read_region(self, top, left, h, w, fill=255, out=None):
+        """
+        Region of the image, the parts outside the image are filled with fill
+        :param out: array to write the region to, allocated if None
+        """
+        if out is None:
+            out = np.empty((h, w) + self.shape[2:], dtype=self.tiles.dtype)
+        out[...] = fill
+        T = self.tile_size
+        y0, y1 = max(top, 0), min(top + h, self.shape[0])
+        x0, x1 = max(left, 0), min(left + w, self.shape[1])
+        for ty in range(y0 // T, (y1 - 1) // T + 1 if y1 > y0 else 0):
+            for tx in range(x0 // T, (x1 - 1) // T + 1 if x1 > x0 else 0):
+                tile = self.tile(ty, tx)
+                # overlap of the tile and the region, in image coordinates
+                a0, a1 = max(y0, ty * T), min(y1, (ty + 1) * T)
+                b0, b1 = max(x0, tx * T), min(x1, (tx + 1) * T)
+                out[a0 - top:a1 - top, b0 - left:b1 - left] = \
+                    tile[a0 - ty * T:a1 - ty * T, b0 - tx * T:b1 - tx * T]
+        return out
+
+
+class TiledMask:
+    """
+    Boolean mask stored as tiles bit-packed along x, looked up like the full mask
+    with (row, col) integers or integer arrays
+    """
+    def __init__(self, bits, shape):
+        """
+        :param bits: [rows, cols, T, T / 8] tile-major packed bits
+        """
+        self.bits = bits
+        self.shape = tuple(shape)
+        self.tile_size = bits.shape[2]
+
+    def __getitem__(self, index):
+        rows, cols = np.asarray(index[0]), np.asarray(index[1])
+        T = self.tile_size
+        x = cols % T
+        byte = self.bits[rows // T, cols // T, rows % T, x >> 3]
+        return ((byte >> (7 - (x & 7))) & 1).astype(bool)
+
+
+class TileStore:
+    """
+    Read access to a store written by build_tile_store
+    """
+    def __init__(self, store_dir, cache_mb=32):
+        """
+        :param cache_mb: budget of the tiles kept in memory, in MB
+        """
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError('Tile store %s has version %s, expected %d'
+                             % (store_dir, meta.get('version'), STORE_VERSION))
+        self.store_dir = store_dir
+        self.tile_size = meta['tile_size']
+        self.shape = tuple(meta['level_shapes'][0])
+        self.cache = LRUCache(cache_mb * 2 ** 20)
+
+        def _load(name):
+            return np.load(os.path.join(store_dir, name), mmap_mode='r')
+
+        # pyramid levels, looked up like the arrays of tools_cv.build_pyramid
+        self.levels = [TiledImage(_load('level%d.npy' % i), tuple(shape) + (3,), self.cache)
+                       for i, shape in enumerate(meta['level_shapes'])]
+        self.red_clearance = TiledImage(_load('red_clearance.npy'), self.shape)
+        self.red_line = TiledMask(_load('red_bits.npy'), self.shape)
+        self.red_segments = np.load(os.path.join(store_dir, 'red_segments.npy'))
+        self.blue_xy = np.load(os.path.join(store_dir, 'blue_xy.npy'))
+        self.green_xy = np.load(os.path.join(store_dir, 'green_xy.npy'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the tile store of a map image')
+    parser.add_argument('image')
+    parser.add_argument('cache_dir')
+    parser.add_argument('--tile-size', type=int, default=256)
+    args = parser.parse_args()
+    print(open_tile_store(args.image, args.cache_dir, args.tile_size).store_dir)
+
+
+if __name__ == '__main__':
+    main()
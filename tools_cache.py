@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# @File    : tools_cache.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+class LRUCache:
+    """
+    Least recently used cache bounded by a memory budget.
+    The size of each item is given by the caller when it is stored.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()  # key: (value, nbytes)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key][0]
+
+    def put(self, key, value, nbytes):
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+        self._items[key] = (value, nbytes)
+        self.nbytes += nbytes
+
+        # evict the least recently used items, always keep the newest one
+        while self.nbytes > self.max_bytes and len(self._items) > 1:
+            _, (_, size) = self._items.popitem(last=False)
+            self.nbytes -= size
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+
+def file_digest(path, chunk_size=2 ** 20):
+    """
+    Hex digest of the content of a file
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def values_digest(*values):
+    """
+    Hex digest of values with a stable repr (numbers, strings, tuples, bytes)
+    """
+    return hashlib.sha1(repr(values).encode()).hexdigest()
+
+
+def cached_array(path, compute):
+    """
+    Array stored in a .npy file, computed and saved on the first call,
+    then loaded memory-mapped (read-only).
+    :param compute: function returning the array
+    """
+    if not os.path.isfile(path):
+        # written to a temporary file first, so a partial file is never loaded
+        tmp_path = path + '.%d.tmp.npy' % os.getpid()
+        np.save(tmp_path, compute())
+        os.replace(tmp_path, path)
+    return np.load(path, mmap_mode='r')
+
+
+def cached_bytes(path, compute):
+    """
+    Bytes stored in a file, computed and saved on the first call, then read back.
+    :param compute: function returning the bytes
+    """
+    if not os.path.isfile(path):
+        tmp_path = path + '.%d.tmp' % os.getpid()
+        with open(tmp_path, 'wb') as f:
+            f.write(compute())
+        os.replace(tmp_path, path)
+    with open(path, 'rb') as f:
+        return f.read()
@@ -7,7 +7,6 @@
 
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 
 
 def extract_color(img, color):
@@ -59,29 +58,193 @@ def mask2xy(mask):
     return coords
 
 
-def show_img(image, title=None):
-    image = image.astype(np.uint8)
+class PackedMask:
+    """
+    Boolean mask stored with 8 pixels per byte along the rows.
+    Looked up like the full mask with (row, col) integers or integer arrays.
+    """
+    def __init__(self, mask):
+        self.shape = mask.shape
+        self.bits = np.packbits(mask, axis=1)
 
-    plt.imshow(image)
-    # plt.axis('off')
-    if title is not None:
-        plt.title(title)
+    def __getitem__(self, index):
+        rows, cols = index
+        cols = np.asarray(cols)
+        byte = self.bits[rows, cols >> 3]
+        return ((byte >> (7 - (cols & 7))) & 1).astype(bool)
 
-    plt.show()
+    def unpack(self):
+        return np.unpackbits(self.bits, axis=1, count=self.shape[1]).astype(bool)
 
 
-def plot_hist(img_grey, bins=256, range=(0, 255), title=None):
-    hist, bins = np.histogram(img_grey.flatten(), bins=bins, range=range)
+class BoxMask:
+    """
+    Mask of a small region in a large image, stored as a packed mask of the
+    bounding box of the region. Looked up like the full mask.
+    """
+    def __init__(self, mask, offset=(0, 0), shape=None):
+        """
+        :param mask: [h, w] boolean mask containing the region
+        :param offset: (row, col) of mask in the full image, if mask is a crop
+        :param shape: shape of the full image, default to mask.shape
+        """
+        self.shape = mask.shape if shape is None else shape
+
+        rows = np.flatnonzero(np.any(mask, axis=1))
+        cols = np.flatnonzero(np.any(mask, axis=0))
+        if len(rows) == 0:  # empty region
+            rows = cols = np.array([0, -1])
+        self.top = offset[0] + rows[0]
+        self.left = offset[1] + cols[0]
+        self.box = PackedMask(mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1])
+
+    @classmethod
+    def from_xy(cls, coords, shape):
+        """
+        :param coords: [N, 2] xy coordinates of the pixels of the region
+        :param shape: shape of the full image
+        """
+        if len(coords) == 0:
+            return cls(np.zeros((0, 0), dtype=bool), shape=shape)
+        left, top = np.min(coords, axis=0)
+        right, bottom = np.max(coords, axis=0)
+        mask = np.zeros((bottom - top + 1, right - left + 1), dtype=bool)
+        mask[coords[:, 1] - top, coords[:, 0] - left] = True
+        return cls(mask, offset=(top, left), shape=shape)
+
+    def __getitem__(self, index):
+        rows = np.asarray(index[0]) - self.top
+        cols = np.asarray(index[1]) - self.left
+        h, w = self.box.shape
+        inside = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+        return inside & self.box[np.clip(rows, 0, max(h - 1, 0)),
+                                 np.clip(cols, 0, max(w - 1, 0))]
+
+
+def distance_field(mask, max_dist=255):
+    """
+    Distance from each pixel to the closest pixel of the mask
+    :param mask: [h, w], boolean
+    :param max_dist: distances are clipped to this to fit in uint8
+    :return: [h, w] distances in pixels, uint8, 0 on the mask
+    """
+    dist = cv2.distanceTransform(np.uint8(~mask), cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+    return np.minimum(dist, max_dist).astype(np.uint8)
 
-    plt.bar(bins[:-1], hist, width=bins[1] - bins[0],
-            color='lightblue', edgecolor='navy')
-    plt.xlim([0, 256])
-    plt.xlabel('Pixel value')
-    plt.ylabel('Frequency')
-    if title is not None:
-        plt.title(title)
-    plt.show()
-    return hist, bins
 
+# max distance of a point to the center of the pixel it is looked up at
+LOOKUP_ERROR = np.sqrt(0.5)
 
 
+def polygon_clearance(field, corners, spacing=16):
+    """
+    Clearance between the outline of a polygon and a mask, using the distance
+    field of the mask. Two neighbouring samples on the outline whose free circles
+    overlap cover the edge between them, so the outline is proven clear of the
+    mask when all the gaps are covered.
+    :param field: [h, w] distance field of the mask, see distance_field
+    :param corners: [N, 2] xy corners of the polygon in order
+    :param spacing: distance between the samples along the edges
+    :return: lower bound of the clearance of the polygon to the mask in pixels,
+        and whether the whole outline is proven clear
+    """
+    h, w = field.shape
+
+    def _lookup(points):
+        xs = np.clip(np.round(points[:, 0]).astype(np.int32), 0, w - 1)
+        ys = np.clip(np.round(points[:, 1]).astype(np.int32), 0, h - 1)
+        return field[ys, xs].astype(np.float32)
+
+    # the free circle at the center covers the whole polygon
+    center = np.mean(corners, axis=0)
+    radius = np.max(np.linalg.norm(corners - center, axis=1))
+    d_center = _lookup(center[None])[0]
+    if d_center > radius + 1:
+        return d_center - radius - LOOKUP_ERROR, True
+
+    # samples along the closed outline, without the end point of each edge
+    edges = np.roll(corners, -1, axis=0) - corners
+    num = np.maximum(np.ceil(np.linalg.norm(edges, axis=1) / spacing), 1).astype(np.int32)
+    t = np.concatenate([np.arange(n) / n for n in num])
+    index = np.repeat(np.arange(len(corners)), num)
+    samples = corners[index] + t[:, None] * edges[index]
+    d = _lookup(samples)
+
+    gaps = np.linalg.norm(np.roll(samples, -1, axis=0) - samples, axis=1)
+    # rounding to pixels costs up to ~0.71 pixel at each sample
+    d_next = np.roll(d, -1)
+    covered = np.all(d + d_next >= gaps + 2)
+
+    # the distance changes by at most the distance moved along the edge, so the
+    # closest point between two samples is at least (d + d_next - gap) / 2 away
+    lower = np.minimum(np.minimum(d, d_next), (d + d_next - gaps) / 2)
+    return max(np.min(lower) - LOOKUP_ERROR, 0.), covered
+
+
+def build_pyramid(img, min_size=128):
+    """
+    Gaussian image pyramid, each level half the size of the previous one
+    :param img: level 0 image
+    :param min_size: stop before the short side drops below this size
+    :return: list of images [img, img/2, img/4, ...]
+    """
+    pyramid = [img]
+    while min(pyramid[-1].shape[:2]) // 2 >= min_size:
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+def select_pyramid_level(pyramid, scale):
+    """
+    Coarsest pyramid level which still has at least the target resolution
+    :param scale: target size / level 0 size
+    :return: index of the level
+    """
+    if scale >= 1:
+        return 0
+    level = int(np.floor(np.log2(1 / scale)))
+    return min(level, len(pyramid) - 1)
+
+
+def warp_source_region(M, src_shape, dsize, margin=2):
+    """
+    Region of the source image seen in the destination of a perspective warp,
+    so that only this region has to be read
+    :param M: [3, 3] transformation from the source to the destination, as for
+        cv2.warpPerspective
+    :param src_shape: shape of the source image
+    :param dsize: (w, h) of the destination
+    :param margin: pixels added around the region for the interpolation
+    :return: top, left, bottom, right of the region in the source, None if
+        nothing of the source is seen
+    """
+    h, w = src_shape[:2]
+    whole = (0, 0, h, w)
+
+    def _transform(M, points):
+        points = np.c_[points, np.ones(len(points))] @ np.asarray(M, dtype=np.float64).T
+        # points at or behind the horizon, no bounds from them
+        return None if np.any(points[:, 2] <= 1e-12) else points[:, :2] / points[:, 2:]
+
+    # part of the destination covered by the source
+    dst = _transform(M, [[0, 0], [w, 0], [0, h], [w, h]])
+    if dst is None:
+        return whole
+    x0, y0 = np.maximum(dst.min(axis=0), 0)
+    x1, y1 = np.minimum(dst.max(axis=0), dsize)
+    if x0 >= x1 or y0 >= y1:
+        return None
+
+    # back to the source
+    try:
+        M_inv = np.linalg.inv(M)
+    except np.linalg.LinAlgError:
+        return whole
+    src = _transform(M_inv, [[x0, y0], [x1, y0], [x0, y1], [x1, y1]])
+    if src is None:
+        return whole
+    left, top = np.maximum(np.floor(src.min(axis=0)) - margin, 0).astype(np.int64)
+    right, bottom = np.minimum(np.ceil(src.max(axis=0)) + margin, (w, h)).astype(np.int64)
+    if left >= right or top >= bottom:
+        return None
+    return top, left, bottom, right
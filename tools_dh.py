@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# @File    : tools_dh.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+import numpy as np
+
+
+def dh_transforms(a, alpha, d, theta):
+    """
+    Transformation matrices from DH Parameters, same convention as
+    tools_kinematics.get_trans_mat: T = Rx(alpha) Rz(theta) with the
+    translation [a, -sin(alpha) d, cos(alpha) d]
+    :param alpha, theta: in rad, the parameters broadcast against each other
+    :return: [..., 4, 4] matrices
+    """
+    a, alpha, d, theta = np.broadcast_arrays(*[np.asarray(v, dtype=np.float64)
+                                               for v in (a, alpha, d, theta)])
+    ca, sa = np.cos(alpha), np.sin(alpha)
+    ct, st = np.cos(theta), np.sin(theta)
+    T = np.zeros(a.shape + (4, 4))
+    T[..., 0, 0] = ct
+    T[..., 0, 1] = -st
+    T[..., 0, 3] = a
+    T[..., 1, 0] = ca * st
+    T[..., 1, 1] = ca * ct
+    T[..., 1, 2] = -sa
+    T[..., 1, 3] = -sa * d
+    T[..., 2, 0] = sa * st
+    T[..., 2, 1] = sa * ct
+    T[..., 2, 2] = ca
+    T[..., 2, 3] = ca * d
+    T[..., 3, 3] = 1
+    return T
+
+
+class DHChain:
+    """
+    Numeric forward kinematics of a serial chain, evaluated with NumPy for any
+    number of configurations at once.
+    Each link is (a, alpha, d, theta, joint): alpha and theta in deg, joint is
+    'd' (prismatic, the joint value is added to d), 'theta' (revolute, the joint
+    value in rad is added to theta) or None (fixed link).
+    """
+    def __init__(self, links):
+        self.a = np.float64([link[0] for link in links])
+        self.alpha = np.radians([link[1] for link in links])
+        self.d = np.float64([link[2] for link in links])
+        self.theta = np.radians([link[3] for link in links])
+        joints = [link[4] for link in links]
+        self.num_links = len(links)
+        self.num_joints = sum(joint is not None for joint in joints)
+
+        # columns of the joint values added to d and theta
+        index = np.cumsum([joint is not None for joint in joints]) - 1
+        self.prismatic = np.array([joint == 'd' for joint in joints])
+        self.revolute = np.array([joint == 'theta' for joint in joints])
+        self.joint_index = np.where(self.prismatic | self.revolute, index, 0)
+
+    def link_transforms(self, q):
+        """
+        :param q: [..., num_joints] joint values
+        :return: [..., num_links, 4, 4] transformation of each link to the previous one
+        """
+        q = np.asarray(q, dtype=np.float64)
+        values = q[..., self.joint_index]
+        d = self.d + np.where(self.prismatic, values, 0)
+        theta = self.theta + np.where(self.revolute, values, 0)
+        return dh_transforms(self.a, self.alpha, d, theta)
+
+    def frames(self, q):
+        """
+        :param q: [..., num_joints] joint values
+        :return: [..., num_links + 1, 4, 4] transformations of the base (identity)
+            and of each link to the base
+        """
+        links = self.link_transforms(q)
+        frames = np.empty(links.shape[:-3] + (self.num_links + 1, 4, 4))
+        frames[..., 0, :, :] = np.eye(4)
+        for i in range(self.num_links):
+            frames[..., i + 1, :, :] = np.matmul(frames[..., i, :, :], links[..., i, :, :])
+        return frames
+
+    def end_transform(self, q):
+        """
+        :return: [..., 4, 4] transformation of the end effector to the base
+        """
+        return self.frames(q)[..., -1, :, :]
+
+    def joint_positions(self, q):
+        """
+        :return: [..., num_links + 1, 3] positions of the base, the joints and
+            the end effector
+        """
+        return self.frames(q)[..., :3, 3]
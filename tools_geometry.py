@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# @File    : tools_geometry.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+import cv2
+import numpy as np
+
+
+def rotation(theta, direction):
+    if direction == 'x':
+        R = np.array([[1, 0, 0],
+                      [0, np.cos(theta), -np.sin(theta)],
+                      [0, np.sin(theta), np.cos(theta)]])
+    elif direction == 'y':
+        R = np.array([[np.cos(theta), 0, np.sin(theta)],
+                      [0, 1, 0],
+                      [-np.sin(theta), 0, np.cos(theta)]])
+    elif direction == 'z':
+        R = np.array([[np.cos(theta), -np.sin(theta), 0],
+                      [np.sin(theta), np.cos(theta), 0],
+                      [0, 0, 1]])
+    else:
+        raise ValueError('Direction should be x, y or z')
+    return R
+
+
+def add_translation(R, t=np.array([0, 0, 0, 1])):
+    if len(t) == 3:
+        t = np.hstack([t, 1])
+    T = np.vstack([R, np.array([[0, 0, 0]])])
+    T = np.hstack([T, t.reshape(-1, 1)])
+    return T
+
+
+def extract_segments(mask, tolerance=1.):
+    """
+    Outline of a mask as line segments
+    :param mask: [h, w], boolean
+    :param tolerance: max distance (in pixels) between the simplified polylines
+        and the contours of the mask
+    :return: [N, 2, 2] segments, each with two xy end points
+    """
+    contours, _ = cv2.findContours(np.uint8(mask), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    segments = []
+    for contour in contours:
+        polyline = cv2.approxPolyDP(contour, tolerance, True).reshape(-1, 2)
+        # closed polylines, a single pixel becomes a zero length segment
+        segments.append(np.stack([polyline, np.roll(polyline, -1, axis=0)], axis=1))
+    if not segments:
+        return np.zeros((0, 2, 2), dtype=np.float32)
+    return np.concatenate(segments).astype(np.float32)
+
+
+class SegmentGrid:
+    """
+    Uniform grid over line segments for rectangle queries.
+    Each cell lists the segments whose bounding boxes overlap it, in a flat
+    array sorted by cell (cell_start[i]:cell_start[i+1] are the segments of cell i).
+    """
+    def __init__(self, segments, cell_size=64):
+        self.segments = segments
+        self.cell_size = cell_size
+
+        lo = np.floor(np.min(segments, axis=1) / cell_size).astype(np.int64)
+        hi = np.floor(np.max(segments, axis=1) / cell_size).astype(np.int64)
+        self.origin = np.min(lo, axis=0) if len(segments) else np.zeros(2, np.int64)
+        lo -= self.origin
+        hi -= self.origin
+        self.nx, self.ny = (np.max(hi, axis=0) + 1) if len(segments) else (1, 1)
+
+        # all (segment, cell) pairs
+        nxs = hi[:, 0] - lo[:, 0] + 1
+        counts = nxs * (hi[:, 1] - lo[:, 1] + 1)
+        seg = np.repeat(np.arange(len(segments)), counts)
+        k = np.arange(len(seg)) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = (lo[seg, 1] + k // nxs[seg]) * self.nx + lo[seg, 0] + k % nxs[seg]
+
+        order = np.argsort(cells, kind='stable')
+        self.cell_segments = seg[order]
+        self.cell_start = np.searchsorted(cells[order], np.arange(self.nx * self.ny + 1))
+
+    def query(self, lo, hi):
+        """
+        Indices of the segments which may overlap the box between xy lo and hi
+        """
+        ix0, iy0 = np.floor(np.asarray(lo) / self.cell_size).astype(np.int64) - self.origin
+        ix1, iy1 = np.floor(np.asarray(hi) / self.cell_size).astype(np.int64) - self.origin
+        ix0, ix1 = max(ix0, 0), min(ix1, self.nx - 1)
+        iy0, iy1 = max(iy0, 0), min(iy1, self.ny - 1)
+        if ix0 > ix1 or iy0 > iy1:
+            return np.zeros(0, dtype=np.int64)
+
+        # cells of a grid row are contiguous
+        rows = np.arange(iy0, iy1 + 1) * self.nx
+        index = [self.cell_segments[self.cell_start[row + ix0]:self.cell_start[row + ix1 + 1]]
+                 for row in rows]
+        return np.unique(np.concatenate(index))
+
+    def rectangle_contact(self, corners):
+        """
+        Exact intersection between a rectangle and the segments.
+        :param corners: [4, 2] xy corners of the rectangle in order
+        :return: xy of the contact point, the point of the segments inside the
+            rectangle closest to its center, or None if no intersection
+        """
+        center = np.mean(corners, axis=0)
+        candidates = self.query(np.min(corners, axis=0), np.max(corners, axis=0))
+        if len(candidates) == 0:
+            return None
+
+        # rectangle frame: axes along its two sides
+        sides = [corners[0] - corners[3], corners[0] - corners[1]]
+        half_size = np.array([np.linalg.norm(side) / 2 for side in sides])
+        axes = np.column_stack([side / np.linalg.norm(side) for side in sides])
+
+        segments = self.segments[candidates]
+        p0 = np.matmul(segments[:, 0] - center, axes)
+        d = np.matmul(segments[:, 1] - segments[:, 0], axes)
+
+        # Liang-Barsky clipping of the segments to the rectangle
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_a = (-half_size - p0) / d
+            t_b = (half_size - p0) / d
+        parallel = d == 0
+        outside = parallel & (np.abs(p0) > half_size)
+        t_a[parallel] = -np.inf
+        t_b[parallel] = np.inf
+        t_enter = np.max(np.minimum(t_a, t_b), axis=1, initial=0)
+        t_exit = np.min(np.maximum(t_a, t_b), axis=1, initial=1)
+        hit = (t_enter <= t_exit) & ~np.any(outside, axis=1)
+        if not np.any(hit):
+            return None
+
+        # point of each clipped segment closest to the center
+        p0, d = p0[hit], d[hit]
+        length2 = np.sum(d ** 2, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(length2 > 0, -np.sum(p0 * d, axis=1) / length2, 0)
+        t = np.clip(t, t_enter[hit], t_exit[hit])
+        closest = p0 + t[:, None] * d
+        i = np.argmin(np.sum(closest ** 2, axis=1))
+        return center + np.matmul(axes, closest[i])
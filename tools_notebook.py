@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# @File    : tools_notebook.py
+# @Time    : 18/10/2026
+# @Author  : Fanyi Sun
+# @Github  : https://github.com/sunfanyi
+# @Software: PyCharm
+
+"""
+Helpers for the jupyter notebooks only, kept out of the game so that it does not
+import IPython and matplotlib.
+"""
+
+import numpy as np
+import sympy as sp
+import matplotlib.pyplot as plt
+from IPython.display import display, Math
+
+
+# =============================== Symbolic printing ===============================
+def get_mat_rolling(alpha, beta, L):
+    res = sp.Matrix([sp.sin(alpha+beta), -sp.cos(alpha+beta), -L*sp.cos(beta)]).T
+    res.simplify()
+    return res
+
+
+def get_mat_no_sliding(alpha, beta, L):
+    res = sp.Matrix([sp.cos(alpha+beta), sp.sin(alpha+beta), L*sp.sin(beta)]).T
+    res.simplify()
+    return res
+
+
+def eqnprint(left=None, alias=None, right=None, ans=None, simplify=True):
+    def _concat_expression(expression):
+        if type(expression) is list:
+            exp = ''
+            for each in expression:
+                if simplify:
+                    each = sp.simplify(each)
+                exp = exp + '{' + sp.latex(each.subs(alias)) + '}'
+        else:
+            if simplify:
+                expression = sp.simplify(expression)
+            exp = sp.latex(expression.subs(alias))
+        return exp
+
+    if left is not None:
+        left = _concat_expression(left)
+    if right is not None:
+        right = _concat_expression(right)
+
+    if right is None:
+        expr_latex = left + '=' + str(ans)
+    elif ans is None:
+        expr_latex = left + '=' + right
+    else:
+        expr_latex = left + '=' + right + '=' + str(ans)
+    display(Math(expr_latex))
+
+
+def get_sym(symbol, sub='', sup='', dot=False, show=False):
+    if (sup == '') & (sub == ''):
+        info = r"{}".format(symbol)
+    elif sup == '':
+        info = r"{}_{{{}}}".format(symbol, sub)
+    elif sub == '':
+        info = r"^{}{}".format(sup, symbol)
+    else:
+        info = r"^{{{}}}{}_{{{}}}".format(sup, symbol, sub)
+
+    if dot == 1:
+        info = r'\dot{%s}' % info
+    elif dot == 2:
+        info = r'\ddot{%s}' % info
+
+    if show:
+        display(sp.symbols(info))
+
+    return sp.symbols(info)
+
+
+def matprint(matrix, alias=None):
+    if alias:
+        display(matrix.subs(alias))
+    else:
+        display(matrix)
+
+
+def update_target_vals(T0e_target, initial_vals):
+    """
+    get the target values from the position of end effector which can be used
+    for inverse kinematics
+    :param T0e_target: matrix of the position of end effector
+    :param initial_vals: a dict containing all the keys, eg.
+        initial_vals = {r11: None, r12: None, r13: None,
+                        r21: None, r22: None, r23: None,
+                        r31: None, r32: None, r33: None,
+                        X: None, Y: None, Z: None}
+        where the rii, X, Y, Z are sympy symbols
+    :return: a dict containing target rii, X, Y, Z values, which can be
+        substituted easily to equation by .subs(vals), eg.
+    """
+    keys = list(initial_vals.keys())  # take the keys
+    # update the values
+    vals = {keys[0]: T0e_target[0, 0], keys[1]: T0e_target[0, 1], keys[2]: T0e_target[0, 2],
+            keys[3]: T0e_target[1, 0], keys[4]: T0e_target[1, 1], keys[5]: T0e_target[1, 2],
+            keys[6]: T0e_target[2, 0], keys[7]: T0e_target[2, 1], keys[8]: T0e_target[2, 2],
+            keys[9]: T0e_target[0, 3], keys[10]: T0e_target[1, 3], keys[11]: T0e_target[2, 3]}
+    return vals
+
+
+# =============================== Images ===============================
+def show_img(image, title=None):
+    image = image.astype(np.uint8)
+
+    plt.imshow(image)
+    # plt.axis('off')
+    if title is not None:
+        plt.title(title)
+
+    plt.show()
+
+
+def plot_hist(img_grey, bins=256, range=(0, 255), title=None):
+    hist, bins = np.histogram(img_grey.flatten(), bins=bins, range=range)
+
+    plt.bar(bins[:-1], hist, width=bins[1] - bins[0],
+            color='lightblue', edgecolor='navy')
+    plt.xlim([0, 256])
+    plt.xlabel('Pixel value')
+    plt.ylabel('Frequency')
+    if title is not None:
+        plt.title(title)
+    plt.show()
+    return hist, bins
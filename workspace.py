@@ -5,12 +5,18 @@
 # @Github  : https://github.com/sunfanyi
 # @Software: PyCharm
 
+import os
+
 import pygame
 import numpy as np
 import cv2
 
 import game_function as gf
-from tools_cv import extract_color, mask2xy
+import text_cache
+from tools_cv import build_pyramid, select_pyramid_level, warp_source_region
+from tools_cache import LRUCache, values_digest, cached_array
+from tile_store import open_tile_store
+from simulation import Track
 
 
 class Workspace:
@@ -20,21 +26,32 @@ class Workspace:
         self.map_settings = settings.map_screen
 
         asset_url = gf.resource_path(self.map_settings['path'])
-        img = cv2.imread(asset_url)
-        self.img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        # self.img = np.ones([3680, 5224, 3]).astype(np.uint8)
+        # the map and its features are read from a tiled store in the cache directory,
+        # built on the first run, so only the regions in use are loaded
+        self.tiles = open_tile_store(asset_url, self.map_settings['cache_dir'],
+                                     self.map_settings['tile_size'],
+                                     self.map_settings['tile_cache_mb'],
+                                     self.map_settings['store_build_mb'])
+        # downsampled copies of the map for warping to lower resolutions,
+        # looked up like arrays, down to a single tile
+        self.pyramid = self.tiles.levels
+
+        # warped maps and axes of the visited views, keyed by the rounded R_view
+        self.view_cache = LRUCache(self.map_settings['view_cache_mb'] * 2 ** 20)
 
         self.R_view = gf.trimetric_view()
-        self._get_3D_map()
-        self.map2d = self._pad_2D_map()
-        self._get_axes()
+        self._update_view(persist=True)
 
         self._extract_map_features()
 
-    def _get_3D_map(self):
-        img = self.img
-        img_w = img.shape[1]
-        img_h = img.shape[0]
+    def _get_3D_map(self, persist=False):
+        """
+        :param persist: if the warped map is saved to (or loaded from) the store,
+            for the views shown at every launch
+        """
+        # warp from the pyramid level matching the scale of the map screen
+        level = select_pyramid_level(self.pyramid, self.map_settings['scale_factor'])
+        img_h, img_w = self.pyramid[level].shape[:2]
 
         # Apply non-affine transformation
         # corner points from:
@@ -54,35 +71,39 @@ class Workspace:
         self.map_pos = cornersB[0]  # top left corner of the map
 
         M = cv2.getPerspectiveTransform(cornersA, cornersB)
-        warped = cv2.warpPerspective(img, M, (self.map_settings['w'],
-                                              self.map_settings['h']))
-        warped = gf.cv2_to_pygame(warped)
+        dsize = (self.map_settings['w'], self.map_settings['h'])
 
-        # Convert black pixels caused by non-affine transformation to white
-        gray = cv2.cvtColor(warped, cv2.COLOR_BGR2GRAY)
-        black_pixels = np.where(gray == 0)
-        map3d = warped.copy()
-        map3d[black_pixels] = [255, 255, 255]
+        def warp():
+            # only the region of the level seen on the map screen is read
+            region = warp_source_region(M, (img_h, img_w), dsize)
+            if region is None:
+                warped = np.zeros((dsize[1], dsize[0], 3), dtype=np.uint8)
+            else:
+                top, left, bottom, right = region
+                # region pixel + (left, top) is the level pixel
+                T = np.float64([[1, 0, left], [0, 1, top], [0, 0, 1]])
+                warped = cv2.warpPerspective(self.pyramid[level][top:bottom, left:right],
+                                             M @ T, dsize)
+            warped = gf.cv2_to_pygame(warped)
+
+            # Convert black pixels caused by non-affine transformation to white
+            gray = cv2.cvtColor(warped, cv2.COLOR_BGR2GRAY)
+            black_pixels = np.where(gray == 0)
+            map3d = warped.copy()
+            map3d[black_pixels] = [255, 255, 255]
+            return map3d
+
+        if persist:
+            # the warp is given by the matrix, the output size and the source level
+            key = values_digest(np.round(M, 6).tobytes(), dsize, level)[:16]
+            map3d = cached_array(os.path.join(self.tiles.store_dir, 'view-%s.npy' % key), warp)
+        else:
+            map3d = warp()
 
         self.map3d = map3d
+        self.map3d_pyramid = build_pyramid(map3d, min_size=16)
         self.map3d_surf = pygame.surfarray.make_surface(map3d)
 
-    def _pad_2D_map(self):
-        """
-        Pad edges with zero for cropping the zoomed in region
-        when the car is in the boundary of the map
-        """
-        pad_size = 1000
-        img = self.img
-        pad = np.full((img.shape[0] + 2 * pad_size,
-                       img.shape[1] + 2 * pad_size,
-                       3), 255, dtype=np.uint8)
-        pad[pad_size:pad_size + img.shape[0],
-        pad_size:pad_size + img.shape[1]] = img
-        self.pad_size = pad_size
-
-        return pad
-
     def _get_axes(self):
         self.axes = pygame.surface.Surface((self.map_settings['w'],
                                             self.map_settings['h']),
@@ -97,87 +118,53 @@ class Workspace:
         y_tick_interval = self.map_settings['y_tick_interval']
         z_tick_interval = self.map_settings['z_tick_interval']
 
-        axes_font = pygame.font.Font(None, 24)  # font for axes labels
-        tick_font = pygame.font.Font(None, 18)  # font for tick labels
+        axes_font_size = 24  # font for axes labels
+        tick_font_size = 18  # font for tick labels
         axes_color = (0, 0, 0)
         tick_color = (100, 100, 100)
 
-        # Draw X-axis
-        line = [origin3d, xend]
-        _, xpoint_2d = gf.draw_line(self.axes, line, axes_color, 2,
-                                    self.R_view, self.map_pos)
-        # X-axis label
-        x_label = axes_font.render("X", True, axes_color)
-        self.axes.blit(x_label, xpoint_2d)
-        # X-axis ticks
-        for i in range(0, xend[0], x_tick_interval):
-            tick_x, tick_y = gf.point_3d_to_2d(i, 0, 0, self.R_view, self.map_pos)
-            tick_label = tick_font.render(str(i), True, tick_color)
-            self.axes.blit(tick_label, (tick_x, tick_y))
-
-        # Draw Y-axis
-        line = [origin3d, yend]
-        _, ypoint_2d = gf.draw_line(self.axes, line, axes_color, 2,
-                                    self.R_view, self.map_pos)
-        # Y-axis label
-        y_label = axes_font.render("Y", True, axes_color)
-        self.axes.blit(y_label, ypoint_2d)
-        # Y-axis ticks
-        for i in range(y_tick_interval, yend[1], y_tick_interval):
-            tick_x, tick_y = gf.point_3d_to_2d(0, i, 0, self.R_view, self.map_pos)
-            tick_label = tick_font.render(str(i), True, tick_color)
-            self.axes.blit(tick_label, (tick_x, tick_y))
-
-        # Draw Z-axis
-        line = [origin3d, zend]
-        _, zpoint_2d = gf.draw_line(self.axes, line, axes_color, 2,
-                                    self.R_view, self.map_pos)
-        # Z-axis label
-        z_label = axes_font.render("Z", True, axes_color)
-        self.axes.blit(z_label, zpoint_2d)
-        # Z-axis ticks
-        for i in range(z_tick_interval, zend[2] + z_tick_interval, z_tick_interval):
-            tick_x, tick_y = gf.point_3d_to_2d(0, 0, i, self.R_view, self.map_pos)
-            tick_label = tick_font.render(str(i), True, tick_color)
-            self.axes.blit(tick_label, (tick_x, tick_y))
+        # project the axis ends and all tick positions in one go
+        ends_2d = gf.points_3d_to_2d([origin3d, xend, yend, zend],
+                                     self.R_view, self.map_pos)
+        x_ticks = np.arange(0, xend[0], x_tick_interval)
+        y_ticks = np.arange(y_tick_interval, yend[1], y_tick_interval)
+        z_ticks = np.arange(z_tick_interval, zend[2] + z_tick_interval, z_tick_interval)
+        ticks3d = np.zeros((len(x_ticks) + len(y_ticks) + len(z_ticks), 3))
+        ticks3d[:len(x_ticks), 0] = x_ticks
+        ticks3d[len(x_ticks):len(x_ticks) + len(y_ticks), 1] = y_ticks
+        ticks3d[len(x_ticks) + len(y_ticks):, 2] = z_ticks
+        ticks_2d = gf.points_3d_to_2d(ticks3d, self.R_view, self.map_pos)
+        tick_values = np.concatenate([x_ticks, y_ticks, z_ticks])
+
+        # Draw axes: X and Y as one polyline through the origin, then Z
+        pygame.draw.lines(self.axes, axes_color, False, ends_2d[[1, 0, 2]], 2)
+        pygame.draw.line(self.axes, axes_color, ends_2d[0], ends_2d[3], 2)
+
+        # Axes labels
+        for label, end_2d in zip(['X', 'Y', 'Z'], ends_2d[1:]):
+            axis_label = text_cache.render(label, axes_font_size, axes_color)
+            self.axes.blit(axis_label, end_2d)
+
+        # Axes ticks
+        for value, tick_2d in zip(tick_values, ticks_2d):
+            tick_label = text_cache.render(str(value), tick_font_size, tick_color)
+            self.axes.blit(tick_label, tick_2d)
 
     def _extract_map_features(self):
         """
-        Extract features of the map, including red line, blue start line,
-        blue end line, green end line.
-        # return:
-        red_line: binary mask of the red line
-        blue_start: xy central coordinates of the bottom right blue circle
-        blue_end: xy central coordinates of the top left blue circle
-        start_mask: binary mask of the blue start circle
-        end_mask: binary mask of the blue end circle
-        green_end: xy central coordinates of the green circle for the manipulator
+        Extract features of the map, see simulation.Track, the features are
+        also attributes of the workspace
         """
-        _, mask_R = extract_color(self.img, 'R')
-        _, mask_G = extract_color(self.img, 'G')
-        _, mask_B = extract_color(self.img, 'B')
-
-        G_coords = mask2xy(mask_G)
-        B_coords = mask2xy(mask_B)
+        self.track = Track(self.tiles)
 
-        # Red
-        self.red_line = mask_R
-
-        # Blue
-        circle1 = B_coords[B_coords[:, 0] < 2000]  # left
-        circle2 = B_coords[B_coords[:, 0] > 2000]  # right
-
-        self.blue_end = np.mean(circle1, axis=0)
-        self.blue_start = np.mean(circle2, axis=0)
-
-        self.start_mask = mask_B.copy()
-        self.start_mask[:2000, :] = False
-
-        self.end_mask = mask_B.copy()
-        self.end_mask[2000:, :] = False
-
-        # Green
-        self.green_end = np.mean(G_coords, axis=0)
+        self.red_clearance = self.track.red_clearance
+        self.red_segments = self.track.red_segments
+        self.red_line = self.track.red_line
+        self.blue_start = self.track.blue_start
+        self.blue_end = self.track.blue_end
+        self.start_mask = self.track.start_mask
+        self.end_mask = self.track.end_mask
+        self.green_end = self.track.green_end
 
     def update_R(self, R=np.eye(3), reset=False):
         if reset:
@@ -189,8 +176,29 @@ class Workspace:
                 self.R_view = np.matmul(R, self.R_view)
             else:
                 raise ValueError("Unknown description of orientation")
-        self._get_3D_map()
-        self._get_axes()
+        self._update_view(persist=reset)
+
+    def _update_view(self, persist=False):
+        """
+        Get the warped map and axes of the current R_view, from the cache
+        if this view has been rendered before.
+        :param persist: see _get_3D_map
+        """
+        # + 0. to merge -0. and 0. in the key
+        key = (np.round(self.R_view, self.map_settings['view_decimals']) + 0.).tobytes()
+        self.view_key = key  # identifies the view, e.g. in the states of cached drawings
+        view = self.view_cache.get(key)
+        if view is None:
+            self._get_3D_map(persist)
+            self._get_axes()
+            view = (self.map3d_pyramid, self.map3d_surf, self.axes, self.map_pos)
+            nbytes = sum(level.nbytes for level in self.map3d_pyramid) + \
+                sum(surf.get_bytesize() * surf.get_width() * surf.get_height()
+                    for surf in [self.map3d_surf, self.axes])
+            self.view_cache.put(key, view, nbytes)
+        else:
+            self.map3d_pyramid, self.map3d_surf, self.axes, self.map_pos = view
+            self.map3d = self.map3d_pyramid[0]
 
     def draw(self):
         self.screen.blit(self.map3d_surf, self.map_settings['topleft'])